@@ -0,0 +1,258 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import signal
+import sys
+import time
+import traceback
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+import main
+
+# Batch defaults
+DEFAULT_SESSIONS = 100
+DEFAULT_SEED = 1
+DEFAULT_MINUTES = 5  # Game time per session before the bot is counted as surviving
+SAMPLE_SECONDS = 10  # Game time between samples of the money curve
+SHOP_SECONDS = 30  # Game time between the bot's visits to the shop; 0 never shops
+PROGRESS_EVERY = 25
+
+# Bot policies: name -> function(game, tick) returning that tick's inputs.
+# They only read the game, so a session is fully determined by its seed.
+def nearest_enemy(game):
+    return game.enemy_index.nearest_x(game.player.rect.x, main.is_living)
+
+def brawler(game, tick):
+    # Walk up to the nearest enemy and fight it in melee, converting when close
+    player = game.player
+    enemy = nearest_enemy(game)
+    if enemy is None:
+        return main.InputState()
+    distance = enemy.rect.x - player.rect.x
+    close = abs(distance) < main.ATTACK_RANGE
+    return main.InputState(
+        move=0 if close else (1 if distance > 0 else -1),
+        jump=tick % 240 == 0,
+        melee=close,
+        ranged=not close,
+        convert=close and tick % 30 == 0
+    )
+
+def kiter(game, tick):
+    # Keep a few attack ranges away and shoot, falling back to melee when caught
+    player = game.player
+    enemy = nearest_enemy(game)
+    if enemy is None:
+        return main.InputState()
+    distance = enemy.rect.x - player.rect.x
+    toward = 1 if distance > 0 else -1
+    if abs(distance) < main.ATTACK_RANGE:
+        return main.InputState(move=0, melee=True, jump=tick % 45 == 0)
+    pinned = player.rect.left <= 0 or player.rect.right >= game.world.width
+    if abs(distance) < main.ATTACK_RANGE * 3 and not pinned:
+        return main.InputState(move=-toward)
+    # Face the enemy for a tick before firing
+    return main.InputState(move=toward if tick % 2 else 0, ranged=tick % 2 == 0)
+
+POLICIES = {
+    "brawler": brawler,
+    "kiter": kiter
+}
+
+# Spend money the way a player would from the shop screen: buy the strongest
+# weapon that beats the current attack power and is affordable
+def visit_shop(game):
+    bought = []
+    shop = game.shop_system
+    for index in sorted(range(len(shop.weapons)), key=lambda i: -shop.weapons[i].damage):
+        weapon = shop.weapons[index]
+        if weapon.damage > game.player.attack_power and shop.buy_weapon(index, game.player, game.money_system):
+            bought.append(weapon.name)
+            break
+    return bought
+
+# Worker process setup: headless pygame and every asset loaded once, so
+# sessions never touch the disk. Asset messages go to stderr. SDL turns
+# SIGTERM into a quit event, which would stop the pool from shutting
+# workers down, so the default handler is put back.
+def init_worker():
+    sys.stdout = sys.stderr
+    main.init_pygame(headless=True)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    main.asset_pack.open()
+    main.frame_cache.prewarm(main.PLAYER_ANIMATIONS + main.ENEMY_ANIMATIONS)
+
+# One seeded session. Returns a plain dict so it pickles back to the parent.
+def run_session(job):
+    seed, policy_name, max_ticks, horde = job
+    policy = POLICIES[policy_name]
+    sample_ticks = SAMPLE_SECONDS * main.TICK_RATE
+    shop_ticks = SHOP_SECONDS * main.TICK_RATE
+    result = {"seed": seed, "policy": policy_name}
+    try:
+        game = main.Game(seed=seed, horde=horde)
+        money_curve = [game.money_system.money]
+        level_curve = [game.level_system.level]
+        purchases = []
+        start = time.perf_counter()
+        while game.ticks < max_ticks and not game.game_over:
+            if shop_ticks and game.ticks % shop_ticks == 0:
+                purchases.extend(visit_shop(game))
+            game.tick(policy(game, game.ticks))
+            if game.ticks % sample_ticks == 0:
+                money_curve.append(game.money_system.money)
+                level_curve.append(game.level_system.level)
+        elapsed = time.perf_counter() - start
+
+        result.update({
+            "ticks": game.ticks,
+            "survival_seconds": round(game.ticks / main.TICK_RATE, 2),
+            "died": game.game_over,
+            "kills": game.level_system.total_kills,
+            "level": game.level_system.level,
+            "money": game.money_system.money,
+            "allies": len(game.ally_system.allies),
+            "attack_power": game.player.attack_power,
+            "purchases": purchases,
+            "money_curve": money_curve,
+            "level_curve": level_curve,
+            "ticks_per_sec": round(game.ticks / max(elapsed, 1e-9), 1),
+            "ai": game.ai.stats(),
+            "pools": game.pool_stats()
+        })
+    except Exception:
+        result["error"] = traceback.format_exc()
+    return result
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(values):
+    if not values:
+        return None
+    return {
+        "mean": round(sum(values) / len(values), 2),
+        "min": min(values),
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "max": max(values)
+    }
+
+# Money at each sample point across sessions still alive at that point
+def curve_summary(curves):
+    points = []
+    for i in range(max((len(curve) for curve in curves), default=0)):
+        values = [curve[i] for curve in curves if i < len(curve)]
+        points.append({
+            "seconds": i * SAMPLE_SECONDS,
+            "sessions": len(values),
+            "mean": round(sum(values) / len(values), 1),
+            "p10": percentile(values, 0.1),
+            "p50": percentile(values, 0.5),
+            "p90": percentile(values, 0.9)
+        })
+    return points
+
+def aggregate(results):
+    completed = [result for result in results if "error" not in result]
+    levels = {}
+    purchases = {}
+    for result in completed:
+        levels[result["level"]] = levels.get(result["level"], 0) + 1
+        for name in result["purchases"]:
+            purchases[name] = purchases.get(name, 0) + 1
+    return {
+        "sessions": len(results),
+        "errors": len(results) - len(completed),
+        "deaths": sum(1 for result in completed if result["died"]),
+        "death_rate": round(sum(1 for result in completed if result["died"]) / len(completed), 3) if completed else 0.0,
+        "survival_seconds": summarize([result["survival_seconds"] for result in completed]),
+        "kills": summarize([result["kills"] for result in completed]),
+        "level": summarize([result["level"] for result in completed]),
+        "money": summarize([result["money"] for result in completed]),
+        "allies": summarize([result["allies"] for result in completed]),
+        "ticks_per_sec": summarize([result["ticks_per_sec"] for result in completed]),
+        "level_histogram": {str(level): levels[level] for level in sorted(levels)},
+        "purchases": purchases,
+        "money_curve": curve_summary([result["money_curve"] for result in completed])
+    }
+
+# Run sessions on a process pool, one per core by default. Results stream back
+# as they finish; each is written to the optional JSON lines file straight away.
+def run_batch(sessions, seed, policy, minutes, workers=None, horde=False, sessions_path=None):
+    workers = workers or os.cpu_count() or 1
+    max_ticks = int(minutes * 60 * main.TICK_RATE)
+    jobs = [(seed + i, policy, max_ticks, horde) for i in range(sessions)]
+    results = []
+    sessions_file = open(sessions_path, "w") if sessions_path else None
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+            for result in pool.imap_unordered(run_session, jobs):
+                results.append(result)
+                if sessions_file:
+                    sessions_file.write(json.dumps(result) + "\n")
+                    sessions_file.flush()
+                if "error" in result:
+                    print("Session with seed %d failed:\n%s" % (result["seed"], result["error"]), file=sys.stderr)
+                if len(results) % PROGRESS_EVERY == 0 or len(results) == sessions:
+                    print("%d/%d sessions, %.1fs" % (len(results), sessions, time.perf_counter() - start), file=sys.stderr)
+    finally:
+        if sessions_file:
+            sessions_file.close()
+    elapsed = time.perf_counter() - start
+
+    total_ticks = sum(result.get("ticks", 0) for result in results)
+    return {
+        "meta": {
+            "sessions": sessions,
+            "seed": seed,
+            "policy": policy,
+            "minutes": minutes,
+            "horde": horde,
+            "workers": workers,
+            "shop_seconds": SHOP_SECONDS,
+            "wall_seconds": round(elapsed, 2),
+            "total_ticks_per_sec": round(total_ticks / max(elapsed, 1e-9), 1),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": main.np.__version__ if main.np is not None else None,
+            "platform": platform.platform()
+        },
+        "summary": aggregate(results)
+    }
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Play many seeded, headless bot sessions in parallel for balance and soak testing")
+    parser.add_argument("--sessions", "-n", type=int, default=DEFAULT_SESSIONS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed of the first session; the rest count up")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="brawler")
+    parser.add_argument("--minutes", type=float, default=DEFAULT_MINUTES, help="game minutes a session may last")
+    parser.add_argument("--workers", "-j", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--horde", action="store_true", help="simulate enemies with NumPy arrays")
+    parser.add_argument("--sessions-out", metavar="FILE", help="also write each session's results to FILE as JSON lines")
+    parser.add_argument("--output", "-o", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.horde and main.np is None:
+        parser.error("--horde requires NumPy")
+
+    report = run_batch(args.sessions, args.seed, args.policy, args.minutes, args.workers, args.horde, args.sessions_out)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report["summary"]["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,308 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+import main
+
+# Benchmark defaults
+DEFAULT_SEED = 1
+DEFAULT_TICKS = 600
+DEFAULT_WARMUP = 60
+MEMORY_TICKS = 120
+REGRESSION_THRESHOLD = 0.10
+
+# Scripted inputs shared by every scenario: walk back and forth and attack
+def bot_inputs(tick):
+    return main.InputState(
+        move=1 if (tick // 120) % 2 else -1,
+        jump=tick % 200 == 0,
+        melee=tick % 20 == 0,
+        ranged=tick % 30 == 0
+    )
+
+# Inputs for scenarios that measure a quiet game: stand still, do nothing
+def no_inputs(tick):
+    return main.InputState()
+
+# Keep the player alive so every scenario runs for the full tick count
+def make_game(seed, **options):
+    game = main.Game(seed=seed, interpolate=True, **options)
+    game.player.max_health = game.player.health = 10 ** 9
+    game.player.add_weapon(game.shop_system.weapons[0])
+    return game
+
+def add_enemies(game, count):
+    game.enemy_spawner.max_enemies = 0
+    for _ in range(count):
+        game.enemy_spawner.spawn_enemy()
+
+def add_allies(game, count):
+    for i in range(count):
+        ally = main.Ally(game, (i * 97) % main.SCREEN_WIDTH, main.GROUND_HEIGHT - 150)
+        game.ally_system.allies.add(ally)
+        game.all_sprites.add(ally)
+
+# Scenarios: name -> setup(seed) returning (game, per-tick hook or None)
+def idle(seed):
+    # An empty field and a player standing still
+    game = make_game(seed)
+    game.enemy_spawner.max_enemies = 0
+    return game, None
+
+def shipped(seed):
+    # The spawner as the game ships it, limited to 4 enemies
+    game = make_game(seed)
+    game.enemy_spawner.spawn_interval = 60
+    return game, None
+
+def enemies_100(seed):
+    game = make_game(seed)
+    add_enemies(game, 100)
+    add_allies(game, 10)
+    return game, None
+
+def enemies_1000(seed):
+    game = make_game(seed)
+    add_enemies(game, 1000)
+    add_allies(game, 50)
+    return game, None
+
+def horde_1000(seed):
+    game = make_game(seed, horde=True)
+    add_enemies(game, 1000)
+    add_allies(game, 50)
+    return game, None
+
+def projectile_storm(seed):
+    game = make_game(seed)
+    game.enemy_spawner.max_enemies = 0
+
+    def fire(game, tick):
+        # 30 enemy shots a tick from both edges, about 3800 in flight
+        for i in range(30):
+            from_left = i % 2 == 0
+            x = -20 if from_left else main.SCREEN_WIDTH + 20
+            y = main.GROUND_HEIGHT - 20 - (i * 37 + tick * 11) % 400
+            game.projectiles.fire(x, y, from_left, from_player=False, speed=8)
+    return game, fire
+
+def long_world(seed):
+    # 5000 enemies spread along a 500-screen level. Only those near the
+    # camera are simulated and drawn, so this should run like a few dozen.
+    game = make_game(seed, world_width=main.SCREEN_WIDTH * 500)
+    game.enemy_spawner.max_enemies = 0
+    for _ in range(5000):
+        game.add_enemy(game.rng.randrange(game.world.width), main.GROUND_HEIGHT - 150)
+    game.world.update(game.camera, force=True)
+
+    def carry_player(game, tick):
+        # Carry the player along the level on top of the bot's walking
+        game.player.rect.x += 5
+    return game, carry_player
+
+SCENARIOS = {
+    "idle": idle,
+    "enemies_4": shipped,
+    "enemies_100_allies": enemies_100,
+    "enemies_1000_allies": enemies_1000,
+    "horde_1000_allies": horde_1000,
+    "projectile_storm": projectile_storm,
+    "long_world": long_world
+}
+
+# Scenarios that do not play with bot_inputs
+SCENARIO_INPUTS = {
+    "idle": no_inputs
+}
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+# Summary of the game state, so two runs can be checked for the same workload
+def checksum(game):
+    return "%d:%d:%d:%d:%d:%d" % (game.ticks, game.level_system.total_kills, game.money_system.money,
+                                  game.enemy_count(), len(game.ally_system.allies), len(game.projectiles))
+
+def run_ticks(game, hook, first_tick, ticks, surface=None, sim_times=None, render_times=None, inputs=bot_inputs):
+    for tick in range(first_tick, first_tick + ticks):
+        start = time.perf_counter()
+        if hook:
+            hook(game, tick)
+        game.step(inputs(tick))
+        if sim_times is not None:
+            sim_times.append(time.perf_counter() - start)
+        if surface is not None:
+            start = time.perf_counter()
+            game.draw(surface, 0.5)
+            game.draw_hud(surface, 0.5)
+            if render_times is not None:
+                render_times.append(time.perf_counter() - start)
+
+def run_scenario(name, seed, ticks, warmup, render=True):
+    setup = SCENARIOS[name]
+    inputs = SCENARIO_INPUTS.get(name, bot_inputs)
+    surface = main.screen if render else None
+
+    # Timing pass
+    game, hook = setup(seed)
+    run_ticks(game, hook, 0, warmup, surface, inputs=inputs)
+    sim_times = []
+    render_times = []
+    run_ticks(game, hook, warmup, ticks, surface, sim_times, render_times, inputs)
+    frame_times = [sim + draw for sim, draw in zip(sim_times, render_times)] if render else sim_times
+
+    # Memory pass on a fresh game, since tracing slows everything down
+    memory_game, memory_hook = setup(seed)
+    run_ticks(memory_game, memory_hook, 0, warmup, surface, inputs=inputs)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start_size, _ = tracemalloc.get_traced_memory()
+    run_ticks(memory_game, memory_hook, warmup, min(ticks, MEMORY_TICKS), surface, inputs=inputs)
+    end_size, peak_size = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    new_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    def ms(seconds):
+        return round(seconds * 1000, 4)
+
+    result = {
+        "ticks": ticks,
+        "ticks_per_sec": round(len(sim_times) / sum(sim_times), 1) if sim_times else 0.0,
+        "sim_ms": {"p50": ms(percentile(sim_times, 0.5)), "p95": ms(percentile(sim_times, 0.95)),
+                   "p99": ms(percentile(sim_times, 0.99))},
+        "frame_ms": {"p50": ms(percentile(frame_times, 0.5)), "p95": ms(percentile(frame_times, 0.95)),
+                     "p99": ms(percentile(frame_times, 0.99))},
+        "peak_memory_kb": round((peak_size - start_size) / 1024, 1),
+        "retained_memory_kb": round((end_size - start_size) / 1024, 1),
+        "new_blocks": new_blocks,
+        "pools": memory_game.pool_stats(),
+        "ai": memory_game.ai.stats(),
+        "world": memory_game.world.stats(),
+        "checksum": checksum(game)
+    }
+    if render:
+        result["render_ms"] = {"p50": ms(percentile(render_times, 0.5)), "p95": ms(percentile(render_times, 0.95)),
+                               "p99": ms(percentile(render_times, 0.99))}
+    return result
+
+def run_benchmarks(names, seed, ticks, warmup, render=True):
+    main.init_pygame(headless=True)
+    main.load_backgrounds()
+    main.frame_cache.prewarm(main.PLAYER_ANIMATIONS + main.ENEMY_ANIMATIONS)
+
+    results = {}
+    for name in names:
+        if name == "horde_1000_allies" and main.np is None:
+            print("Skipping %s: NumPy is not installed" % name, file=sys.stderr)
+            continue
+        results[name] = run_scenario(name, seed, ticks, warmup, render)
+        print("%-22s %10.1f ticks/s  frame p95 %8.3f ms" % (name, results[name]["ticks_per_sec"],
+                                                          results[name]["frame_ms"]["p95"]), file=sys.stderr)
+    return {
+        "meta": {
+            "seed": seed,
+            "ticks": ticks,
+            "warmup": warmup,
+            "render": render,
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": main.np.__version__ if main.np is not None else None,
+            "platform": platform.platform()
+        },
+        "scenarios": results
+    }
+
+# Compare two result files. Each metric is flagged when it is worse than the
+# baseline by more than the threshold (a fraction, 0.10 = 10%).
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    metrics = [
+        ("ticks_per_sec", lambda result: result["ticks_per_sec"], True),
+        ("frame p50", lambda result: result["frame_ms"]["p50"], False),
+        ("frame p95", lambda result: result["frame_ms"]["p95"], False),
+        ("frame p99", lambda result: result["frame_ms"]["p99"], False),
+        ("peak_memory_kb", lambda result: result["peak_memory_kb"], False)
+    ]
+    regressions = []
+    lines = []
+    for name, old in baseline["scenarios"].items():
+        new = current["scenarios"].get(name)
+        if new is None:
+            lines.append("%s: missing from current results" % name)
+            continue
+        if old.get("checksum") != new.get("checksum"):
+            lines.append("%s: workload changed (%s -> %s)" % (name, old.get("checksum"), new.get("checksum")))
+        for metric, value, higher_is_better in metrics:
+            before = value(old)
+            after = value(new)
+            if before == 0:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "  REGRESSION"
+                regressions.append((name, metric, before, after))
+            lines.append("%-22s %-15s %12.3f -> %12.3f  %+7.1f%%%s" % (name, metric, before, after, change * 100, flag))
+    return regressions, lines
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Seeded, headless benchmarks for the game simulation and renderer")
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run (default: all)")
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--ticks", type=int, default=DEFAULT_TICKS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--no-render", action="store_true", help="time the simulation only")
+    parser.add_argument("--output", "-o", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="fraction a metric may worsen before it is a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in SCENARIOS:
+            print(name)
+        return 0
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions, lines = compare(baseline, current, args.threshold)
+        for line in lines:
+            print(line)
+        print("%d regression(s)" % len(regressions))
+        return 1 if regressions else 0
+
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario %r (see --list)" % name)
+
+    # Keep stdout for the JSON report; asset loading messages go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmarks(names, args.seed, args.ticks, args.warmup, not args.no_render)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
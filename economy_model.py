@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import main
+
+np = main.np
+
+# Model defaults
+DEFAULT_PLAYERS = 1000000
+DEFAULT_MINUTES = 30
+DEFAULT_SEED = 1
+STEP_SECONDS = 10  # Game time advanced per vectorized step
+SAMPLE_SECONDS = 60  # Game time between trajectory samples
+LEVEL_MILESTONES = [2, 3, 5, 10, 20, 50]
+
+# Balance parameters. The rules come from the game's constants; the kill
+# rates (kills per minute of play, by who made the kill) describe the players
+# and can be calibrated from a batch_sim.py report. Each player's rates are
+# scaled by a lognormal skill factor with mean 1.
+def default_params():
+    return {
+        "starting_money": main.STARTING_MONEY,
+        "kill_reward": main.KILL_REWARD,
+        "level_up_bonus": main.LEVEL_UP_BONUS,
+        "kill_xp": main.KILL_XP,
+        "ally_kill_xp": main.ALLY_KILL_XP,
+        "melee_level_power": main.MELEE_LEVEL_POWER,
+        "ally_level_power": main.ALLY_LEVEL_POWER,
+        "attack_power": main.PLAYER_ATTACK_POWER,
+        "max_level": main.MAX_LEVEL,
+        "xp_first_level": main.XP_FIRST_LEVEL,
+        "xp_growth": main.XP_GROWTH,
+        "weapons": [[name, damage, price] for name, damage, price, icon, animation in main.SHOP_WEAPONS],
+        "kill_rates": {"melee": 6.0, "ranged": 1.5, "ally": 0.5},
+        "skill_sigma": 0.5,
+        "shop_seconds": 30
+    }
+
+# XP a player needs in total to reach each level, indexed by level. One past
+# the last level is out of reach. Steep growth makes the totals too big for
+# int64; they are just as unreachable, so they saturate at its maximum.
+def level_thresholds(params):
+    table = main.xp_table(params["xp_first_level"], params["xp_growth"], params["max_level"])
+    limit = np.iinfo(np.int64).max
+    thresholds = [0, 0]
+    for xp in table[1:params["max_level"]]:
+        thresholds.append(min(thresholds[-1] + xp, limit))
+    thresholds.append(limit)
+    return np.array(thresholds, dtype=np.int64)
+
+def describe(values):
+    low, median, high = np.percentile(values, [10, 50, 90])
+    return {"mean": round(float(values.mean()), 2), "p10": float(low), "p50": float(median), "p90": float(high)}
+
+# Advance every player through the game in steps of STEP_SECONDS. Each step,
+# kills of each kind are drawn from a Poisson distribution and awarded in
+# turn (melee, ranged, then ally kills), so the level-ups they cause get the
+# same rewards as in the game. Shop visits buy the strongest affordable weapon
+# that beats the player's attack power.
+def run_model(params, players, minutes, seed):
+    rng = np.random.default_rng(seed)
+    thresholds = level_thresholds(params)
+    reached = thresholds[1:-1]
+    max_level = params["max_level"]
+    sigma = params["skill_sigma"]
+    skill = rng.lognormal(-sigma * sigma / 2, sigma, players) if sigma > 0 else np.ones(players)
+
+    money = np.full(players, params["starting_money"], dtype=np.int64)
+    total_xp = np.zeros(players, dtype=np.int64)
+    level = np.ones(players, dtype=np.int64)
+    next_level_xp = np.full(players, thresholds[2], dtype=np.int64)
+    attack_power = np.full(players, params["attack_power"], dtype=np.int64)
+    kills = np.zeros(players, dtype=np.int64)
+    milestones = {target: np.full(players, -1.0) for target in LEVEL_MILESTONES if target <= max_level}
+
+    # Kinds of kill: expected kills per step, XP each, and the reward for a level it causes
+    kinds = []
+    for kind, xp in (("melee", params["kill_xp"]), ("ranged", params["kill_xp"]), ("ally", params["ally_kill_xp"])):
+        expected = skill * params["kill_rates"].get(kind, 0.0) * STEP_SECONDS / 60.0
+        kinds.append((kind, expected, xp))
+    weapons = sorted(params["weapons"], key=lambda weapon: -weapon[1])
+    purchases = {name: 0 for name, damage, price in weapons}
+
+    steps = int(minutes * 60 / STEP_SECONDS)
+    sample_steps = max(1, SAMPLE_SECONDS // STEP_SECONDS)
+    shop_steps = params["shop_seconds"] // STEP_SECONDS if params["shop_seconds"] else 0
+    trajectory = []
+
+    def sample(step):
+        trajectory.append({
+            "seconds": step * STEP_SECONDS,
+            "money": describe(money),
+            "level": describe(level),
+            "attack_power": describe(attack_power),
+            "kills": describe(kills)
+        })
+
+    sample(0)
+    for step in range(steps):
+        if shop_steps and step % shop_steps == 0:
+            shopping = np.ones(players, dtype=bool)
+            for name, damage, price in weapons:
+                buys = shopping & (damage > attack_power) & (money >= price)
+                money[buys] -= price
+                attack_power[buys] = damage
+                shopping &= ~buys
+                purchases[name] += int(buys.sum())
+
+        for kind, expected, xp in kinds:
+            new_kills = rng.poisson(expected)
+            kills += new_kills
+            money += new_kills * params["kill_reward"]
+            total_xp += new_kills * xp
+            
+            # Only players past their next threshold need their level looked up
+            leveled = np.flatnonzero(total_xp >= next_level_xp)
+            if not len(leveled):
+                continue
+            new_level = np.searchsorted(reached, total_xp[leveled], side="right")
+            gained = new_level - level[leveled]
+            level[leveled] = new_level
+            next_level_xp[leveled] = thresholds[new_level + 1]
+            if kind == "melee":
+                attack_power[leveled] += gained * params["melee_level_power"]
+            elif kind == "ally":
+                attack_power[leveled] += gained * params["ally_level_power"]
+            else:
+                money[leveled] += gained * params["level_up_bonus"]
+            
+            minute = (step + 1) * STEP_SECONDS / 60.0
+            for target, reached_at in milestones.items():
+                first = leveled[(new_level >= target) & (reached_at[leveled] < 0)]
+                reached_at[first] = minute
+        if (step + 1) % sample_steps == 0:
+            sample(step + 1)
+
+    level_counts = np.bincount(level, minlength=max_level + 1)
+    return {
+        "trajectory": trajectory,
+        "final": {
+            "money": describe(money),
+            "level": describe(level),
+            "attack_power": describe(attack_power),
+            "kills": describe(kills),
+            "xp": describe(total_xp)
+        },
+        "level_histogram": {str(i): int(count) for i, count in enumerate(level_counts) if count},
+        "milestones": {
+            str(target): {
+                "share": round(float((reached_at >= 0).mean()), 4),
+                "median_minutes": round(float(np.median(reached_at[reached_at >= 0])), 2) if (reached_at >= 0).any() else None
+            }
+            for target, reached_at in milestones.items()
+        },
+        "purchases": purchases,
+        "xp_table": main.xp_table(params["xp_first_level"], params["xp_growth"], params["max_level"])
+    }
+
+# --set KEY=VALUE, where VALUE is JSON (plain text is taken as a string)
+def parse_setting(text):
+    key, _, value = text.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized model of money, XP and attack power for many hypothetical players")
+    parser.add_argument("--players", "-n", type=int, default=DEFAULT_PLAYERS)
+    parser.add_argument("--minutes", type=float, default=DEFAULT_MINUTES, help="game minutes to model")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--params", metavar="FILE", help="JSON file of parameters to override")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help='override one parameter, e.g. --set xp_growth=1.15 --set kill_rates=\'{"melee": 8}\'')
+    parser.add_argument("--show-params", action="store_true", help="print the default parameters and exit")
+    parser.add_argument("--output", "-o", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    params = default_params()
+    if args.show_params:
+        print(json.dumps(params, indent=2))
+        return 0
+    if np is None:
+        parser.error("the economy model requires NumPy")
+    if args.params:
+        with open(args.params) as f:
+            params.update(json.load(f))
+    for setting in args.set:
+        key, value = parse_setting(setting)
+        if key not in params:
+            parser.error("unknown parameter %r (see --show-params)" % key)
+        params[key] = value
+
+    start = time.perf_counter()
+    report = run_model(params, args.players, args.minutes, args.seed)
+    elapsed = time.perf_counter() - start
+    print("Modelled %d players for %g minutes in %.2fs" % (args.players, args.minutes, elapsed), file=sys.stderr)
+
+    report = dict({"meta": {"players": args.players, "minutes": args.minutes, "seed": args.seed,
+                            "step_seconds": STEP_SECONDS, "seconds": round(elapsed, 2), "params": params}}, **report)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
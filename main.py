@@ -1,19 +1,30 @@
 import pygame
 import os
+import io
 import sys
 import random
-import pickle
+import time
+import csv
+import json
+import mmap
+import struct
+import argparse
+import threading
+import heapq
+import weakref
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pygame import mixer
 
-# Initialize pygame
-pygame.init()
-mixer.init()
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Screen dimensions
 SCREEN_WIDTH = 1024
 SCREEN_HEIGHT = 700
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Black Gun")
 
 # Colors
 WHITE = (255, 255, 255)
@@ -28,11 +39,48 @@ LIGHT_GRAY = (200, 200, 200)
 ORANGE = (255, 165, 0)
 
 # Game variables
-clock = pygame.time.Clock()
 FPS = 60
+TICK_RATE = FPS  # Gameplay constants are tuned per tick at 60 ticks/second
+MAX_CATCHUP_TICKS = 5
+MAX_RENDER_FPS = 144  # 0 renders uncapped
 GRAVITY = 0.8
 GROUND_HEIGHT = SCREEN_HEIGHT - 50
 ATTACK_RANGE = 50
+SPATIAL_INDEX = "axis"  # "axis" for the ground line, "grid" for free 2D movement
+USE_HORDE = False  # Simulate enemies as NumPy arrays instead of sprites
+PROJECTILE_CAPACITY = 4096
+SAVE_FILE = "game_save.json"
+SAVE_VERSION = 1
+AUTOSAVE_INTERVAL = 30  # Seconds of wall-clock time between autosaves
+ASSET_WORKERS = 4
+ASSET_POLL_BUDGET = 0.004  # Seconds per frame spent converting streamed-in images
+BACKGROUND_IMAGE = "assets/mohit/city 1/10.png"
+ASSET_PACK_FILE = "assets.pack"
+ENEMY_POOL_PREWARM = 8
+ALLY_POOL_PREWARM = 4
+POOL_HIGH_WATER = 64  # Most free objects a pool keeps for reuse
+FAR_ANIMATION_DISTANCE = SCREEN_WIDTH // 3  # Beyond this from the player, entities count as distant
+WORLD_WIDTH = SCREEN_WIDTH * 16  # Length of the scrolling level
+CHUNK_WIDTH = SCREEN_WIDTH // 2
+ACTIVE_CHUNK_MARGIN = 1  # Chunks past each edge of the view that are still simulated
+BACKGROUND_PARALLAX = 0.5  # The background scrolls at this fraction of the camera's speed
+AI_THINK_HZ = {"enemy": 30, "ally": 20}  # How often each kind of agent re-evaluates its decisions
+AI_THINK_BUDGET = 256  # Most agents that may think in one tick; the rest wait for the next
+USE_TEXTURE_ATLAS = True  # Pack animation frames and icons into shared atlas pages
+ATLAS_PAGE_SIZE = 1024
+
+# Economy and progression
+STARTING_MONEY = 20000
+KILL_REWARD = 10  # Money for every enemy killed, by anyone
+LEVEL_UP_BONUS = 50  # Money for a level gained from a projectile kill
+KILL_XP = 10  # XP for an enemy the player kills
+ALLY_KILL_XP = 5  # XP for an enemy an ally kills
+MELEE_LEVEL_POWER = 2  # Attack power for a level gained from a melee kill
+ALLY_LEVEL_POWER = 1  # Attack power for a level gained from an ally kill
+PLAYER_ATTACK_POWER = 10
+MAX_LEVEL = 100
+XP_FIRST_LEVEL = 100  # XP needed to go from level 1 to 2
+XP_GROWTH = 1.2  # Each level needs this much more XP than the last, rounded down
 
 # Game states
 MENU = 0
@@ -43,51 +91,447 @@ OPTIONS = 4
 HOW_TO_PLAY = 5
 SHOP = 6
 
-# Current game state
-game_state = MENU
+# Display and fonts, created by init_pygame()
+screen = None
+title_font = None
+menu_font = None
+button_font = None
+hud_font = None
+small_font = None
 
-# Fonts
-try:
-    title_font = pygame.font.SysFont("Arial", 64, bold=True)
-    menu_font = pygame.font.SysFont("Arial", 36)
-    button_font = pygame.font.SysFont("Arial", 28)
-except:
-    title_font = pygame.font.Font(None, 64)
-    menu_font = pygame.font.Font(None, 36)
-    button_font = pygame.font.Font(None, 28)
-
-# Audio variables
-menu_music_playing = False
-game_music_playing = False
-button_hover_sound = None
-button_click_sound = None
-attack_sound = None
-enemy_death_sound = None
-jump_sound = None
-
-# Load sounds
-try:
-    mixer.music.load("assets/sounds/labby/ok.mp3")
-except:
-    print("Error loading menu music")
+# Initialize pygame, the window and fonts. Headless runs use SDL's dummy
+# drivers so the game can be simulated without a display or sound card.
+def init_pygame(headless=False):
+    global screen, title_font, menu_font, button_font, hud_font, small_font
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    
+    pygame.init()
+    try:
+        mixer.init()
+    except:
+        print("Error initializing mixer")
+    audio.init()
+    
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Black Gun")
+    
+    # Fonts
+    try:
+        title_font = pygame.font.SysFont("Arial", 64, bold=True)
+        menu_font = pygame.font.SysFont("Arial", 36)
+        button_font = pygame.font.SysFont("Arial", 28)
+    except:
+        title_font = pygame.font.Font(None, 64)
+        menu_font = pygame.font.Font(None, 36)
+        button_font = pygame.font.Font(None, 28)
+    hud_font = pygame.font.SysFont(None, 30)
+    small_font = pygame.font.SysFont(None, 18)
+    
+    build_menu_screens()
+    
+    if not headless:
+        asset_loader.submit(audio.load)
+    return screen
 
-try:
-    button_hover_sound = mixer.Sound("assets/sounds/menu/button/click.mp3")
-    button_click_sound = mixer.Sound("assets/sounds/menu/button/click.mp3")
-except:
-    print("Error loading button sounds")
+# Sound effects: name -> (file, channel group, max concurrent voices, priority)
+SOUND_EFFECTS = {
+    "button_hover": ("assets/sounds/menu/button/click.mp3", "ui", 1, 1),
+    "button_click": ("assets/sounds/menu/button/click.mp3", "ui", 1, 2),
+    "attack": ("assets/sounds/attack.wav", "player", 2, 3),
+    "jump": ("assets/sounds/jump.wav", "player", 1, 2),
+    "enemy_death": ("assets/sounds/enemy_death.wav", "enemies", 3, 1)
+}
+# Mixer channels reserved for each group
+SOUND_CHANNEL_GROUPS = {"ui": 2, "player": 3, "enemies": 4}
 
-try:
-    attack_sound = mixer.Sound("assets/sounds/attack.wav")
-    enemy_death_sound = mixer.Sound("assets/sounds/enemy_death.wav") 
-    jump_sound = mixer.Sound("assets/sounds/jump.wav")
-except:
-    print("Error loading game sounds")
+# Plays sound effects on reserved channel groups. A sound at its voice limit
+# restarts its oldest voice, a full group steals the oldest voice of the lowest
+# priority not above the new sound's, and repeats of a sound within one tick
+# are dropped. Without a mixer, or before the sounds load, play does nothing.
+class AudioManager:
+    def __init__(self, effects=SOUND_EFFECTS, groups=SOUND_CHANNEL_GROUPS):
+        self.effects = effects
+        self.group_sizes = groups
+        self.enabled = False
+        self.sounds = {}
+        self.channels = []
+        self.groups = {}
+        self.voices = {}  # channel index -> (sound name, priority, play order)
+        self.played_this_tick = set()
+        self.plays = 0
+        self.counts = {"played": 0, "deduplicated": 0, "stolen": 0, "dropped": 0}
+        
+    def init(self):
+        self.enabled = False
+        self.channels = []
+        self.groups = {}
+        self.voices.clear()
+        if not mixer.get_init():
+            return False
+        # Reserved channels are never picked by Sound.play or music
+        total = sum(self.group_sizes.values())
+        mixer.set_num_channels(max(total, mixer.get_num_channels()))
+        mixer.set_reserved(total)
+        self.channels = [mixer.Channel(i) for i in range(total)]
+        start = 0
+        for group, size in self.group_sizes.items():
+            self.groups[group] = list(range(start, start + size))
+            start += size
+        self.enabled = True
+        return True
+        
+    def load(self):
+        # Decode each file once; effects that share a file share the Sound
+        if not self.enabled:
+            return
+        decoded = {}
+        for name, (path, group, max_voices, priority) in self.effects.items():
+            if path not in decoded:
+                try:
+                    decoded[path] = mixer.Sound(path)
+                except Exception as e:
+                    print(f"Error loading sound {path}: {e}")
+                    decoded[path] = None
+            if decoded[path] is not None:
+                self.sounds[name] = decoded[path]
+                
+    def begin_tick(self):
+        self.played_this_tick.clear()
+        
+    def play(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            return None
+        if name in self.played_this_tick:
+            self.counts["deduplicated"] += 1
+            return None
+        self.played_this_tick.add(name)
+        
+        path, group, max_voices, priority = self.effects[name]
+        channel_ids = self.groups[group]
+        for channel_id in channel_ids:
+            if channel_id in self.voices and not self.channels[channel_id].get_busy():
+                del self.voices[channel_id]
+                
+        same = [channel_id for channel_id in channel_ids
+                if channel_id in self.voices and self.voices[channel_id][0] == name]
+        if len(same) >= max_voices:
+            target = min(same, key=lambda channel_id: self.voices[channel_id][2])
+        else:
+            free = [channel_id for channel_id in channel_ids if channel_id not in self.voices]
+            if free:
+                target = free[0]
+            else:
+                candidates = [channel_id for channel_id in channel_ids if self.voices[channel_id][1] <= priority]
+                if not candidates:
+                    self.counts["dropped"] += 1
+                    return None
+                target = min(candidates, key=lambda channel_id: self.voices[channel_id][1:])
+                
+        if target in self.voices:
+            self.counts["stolen"] += 1
+        self.plays += 1
+        self.voices[target] = (name, priority, self.plays)
+        channel = self.channels[target]
+        channel.play(sound)
+        self.counts["played"] += 1
+        return channel
+        
+    def stop(self):
+        for channel in self.channels:
+            channel.stop()
+        self.voices.clear()
+        
+    def stats(self):
+        return dict(self.counts, voices=len(self.voices), loaded=len(self.sounds))
+
+audio = AudioManager()
+
+# Read and decode an image file without converting it for the display, so it
+# can run on a worker thread
+def decode_image(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return pygame.image.load(io.BytesIO(data), path)
+
+# Background asset loading. Worker threads read and decode files; the display
+# conversion (convert_alpha) must happen on the main thread, in poll() or
+# when an image is first asked for.
+class AssetLoader:
+    def __init__(self, workers=ASSET_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.futures = {}
+        self.images = {}
+        self.errors = {}
+        self.requested = 0
+        self.finished = 0
+        
+    def submit(self, function, *args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="assets")
+        return self.executor.submit(function, *args)
+        
+    def request(self, path):
+        if path in self.futures or path in self.images or path in self.errors:
+            return
+        self.futures[path] = self.submit(decode_image, path)
+        self.requested += 1
+        
+    def request_folder(self, folder_path):
+        try:
+            for path in animation_files(folder_path):
+                self.request(path)
+        except OSError:
+            pass
+            
+    def is_ready(self, path):
+        future = self.futures.get(path)
+        return future is None or future.done()
+        
+    def pending(self):
+        return len(self.futures)
+        
+    def progress(self):
+        if self.requested == 0:
+            return 1.0
+        return (self.requested - len(self.futures)) / self.requested
+        
+    def finish(self, path):
+        future = self.futures.pop(path)
+        try:
+            self.images[path] = future.result().convert_alpha()
+        except Exception as e:
+            self.errors[path] = e
+        self.finished += 1
+        
+    def poll(self, budget=ASSET_POLL_BUDGET):
+        # Convert finished decodes, spending at most budget seconds this frame
+        start = time.perf_counter()
+        for path, future in list(self.futures.items()):
+            if future.done():
+                self.finish(path)
+                if time.perf_counter() - start > budget:
+                    break
+                    
+    def wait(self):
+        for path in list(self.futures):
+            self.finish(path)
+            
+    def image(self, path):
+        # The converted image, waiting for its decode (or decoding it here if
+        # it was never requested). Raises the load error if decoding failed.
+        if path in self.futures:
+            self.finish(path)
+        elif path not in self.images and path not in self.errors:
+            try:
+                self.images[path] = decode_image(path).convert_alpha()
+            except Exception as e:
+                self.errors[path] = e
+        if path in self.errors:
+            raise self.errors[path]
+        return self.images[path]
+        
+    def take(self, path):
+        # Like image(), but the caller keeps the only reference: everything
+        # drawn uses scaled or atlas copies, so decoded images are not held here
+        image = self.image(path)
+        del self.images[path]
+        return image
+        
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+asset_loader = AssetLoader()
+
+# Pre-baked asset pack: every image at its final size as raw BGRA pixels (the
+# display's 32-bit format), plus a JSON index. At runtime the pack is memory
+# mapped and Surfaces are made straight from the mapped pixels, with no PNG
+# decoding, scaling or folder listing.
+# File layout: magic, version, index length, index (JSON), then pixel data.
+ASSET_PACK_MAGIC = b"BGPK"
+ASSET_PACK_VERSION = 1
+
+def pack_key(path, scale):
+    return f"{path}@{scale}"
+
+# Everything baked into the pack: (kind, path, scale). The background is
+# scaled to the screen rather than by a factor.
+def pack_manifest():
+    manifest = [("animation", folder_path, scale) for folder_path, scale in PLAYER_ANIMATIONS + ENEMY_ANIMATIONS]
+    manifest.extend(("image", path, scale) for path, scale in GAMEPLAY_IMAGES)
+    manifest.append(("image", BACKGROUND_IMAGE, "screen"))
+    return manifest
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def build_asset_pack(pack_file=ASSET_PACK_FILE):
+    # Bake images without the display, so this can run on a worker thread
+    sources = {}
+    folders = {}
+    missing = []  # Manifest paths absent at bake time; the pack is stale once they appear
+    images = {}
+    animations = {}
+    data = bytearray()
+    
+    def add_image(path, scale):
+        key = pack_key(path, scale)
+        if key in images:
+            return key
+        image = decode_image(path)
+        if scale == "screen":
+            image = pygame.transform.scale(image, (SCREEN_WIDTH, SCREEN_HEIGHT))
+        elif scale != 1:
+            image = pygame.transform.scale(image, (int(image.get_width() * scale), int(image.get_height() * scale)))
+        sources[path] = file_signature(path)
+        images[key] = [len(data), image.get_width(), image.get_height()]
+        data.extend(pygame.image.tobytes(image, "BGRA"))
+        return key
+        
+    manifest = pack_manifest()
+    for kind, path, scale in manifest:
+        try:
+            if kind == "animation":
+                files = animation_files(path)
+                folders[path] = files
+                animations[pack_key(path, scale)] = [add_image(file_path, scale) for file_path in files]
+            else:
+                add_image(path, scale)
+        except Exception as e:
+            print(f"Skipping {path} in asset pack: {e}")
+            if not os.path.exists(path):
+                missing.append(path)
+            
+    index = json.dumps({
+        "manifest": manifest,
+        "sources": sources,
+        "folders": folders,
+        "missing": missing,
+        "images": images,
+        "animations": animations
+    }, separators=(',', ':')).encode()
+    header = ASSET_PACK_MAGIC + struct.pack("<II", ASSET_PACK_VERSION, len(index))
+    
+    temp_file = pack_file + ".tmp"
+    with open(temp_file, 'wb') as f:
+        f.write(header)
+        f.write(index)
+        f.write(data)
+    os.replace(temp_file, pack_file)
+    return len(images)
+
+class AssetPack:
+    def __init__(self):
+        self.file = None
+        self.map = None
+        self.index = None
+        self.data_offset = 0
+        
+    def is_current(self, index):
+        # Stale if the manifest, a source file or an animation folder changed,
+        # or an asset missing at bake time now exists
+        if index.get("manifest") != [list(entry) for entry in pack_manifest()]:
+            return False
+        if "missing" not in index or any(os.path.exists(path) for path in index["missing"]):
+            return False
+        try:
+            for folder_path, files in index["folders"].items():
+                if animation_files(folder_path) != files:
+                    return False
+            for path, signature in index["sources"].items():
+                if file_signature(path) != signature:
+                    return False
+        except OSError:
+            return False
+        return True
+        
+    def open(self, pack_file=ASSET_PACK_FILE):
+        # Map the pack if it exists and matches the sources
+        try:
+            f = open(pack_file, 'rb')
+        except OSError:
+            return False
+        pack_map = None
+        try:
+            pack_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            header_size = len(ASSET_PACK_MAGIC) + struct.calcsize("<II")
+            if pack_map[:len(ASSET_PACK_MAGIC)] != ASSET_PACK_MAGIC:
+                raise ValueError("not an asset pack")
+            version, index_length = struct.unpack_from("<II", pack_map, len(ASSET_PACK_MAGIC))
+            if version != ASSET_PACK_VERSION:
+                raise ValueError(f"unsupported version {version}")
+            index = json.loads(pack_map[header_size:header_size + index_length])
+        except Exception as e:
+            print(f"Error reading asset pack: {e}")
+            if pack_map is not None:
+                pack_map.close()
+            f.close()
+            return False
+        if not self.is_current(index):
+            pack_map.close()
+            f.close()
+            return False
+        self.close()
+        self.file = f
+        self.map = pack_map
+        self.index = index
+        self.data_offset = header_size + index_length
+        return True
+        
+    def close(self):
+        # Surfaces made from the map share its memory, and any still held (by
+        # the frame cache or live sprites, when the atlas is off) keep it
+        # mapped until the last of them is released, so they stay valid after
+        # close or reopen
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass
+            self.file.close()
+        self.file = None
+        self.map = None
+        self.index = None
+        
+    def surface(self, key):
+        # A new Surface over the mapped pixels each time; callers cache what
+        # they keep (frame cache, atlas), so nothing is held here
+        entry = self.index["images"].get(key)
+        if entry is None:
+            return None
+        offset, width, height = entry
+        start = self.data_offset + offset
+        pixels = memoryview(self.map)[start:start + width * height * 4]
+        return pygame.image.frombuffer(pixels, (width, height), "BGRA")
+        
+    def image(self, path, scale=1):
+        if self.index is None:
+            return None
+        return self.surface(pack_key(path, scale))
+        
+    def animation(self, folder_path, scale=1):
+        if self.index is None:
+            return None
+        keys = self.index["animations"].get(pack_key(folder_path, scale))
+        if not keys:
+            return None
+        return [self.surface(key) for key in keys]
+
+asset_pack = AssetPack()
 
 # Improved image loading function
 def load_image(path, scale=1):
+    packed = asset_pack.image(path, scale)
+    if packed is not None:
+        return packed
     try:
-        image = pygame.image.load(path).convert_alpha()
+        image = asset_loader.take(path)
         if scale != 1:
             width = int(image.get_width() * scale)
             height = int(image.get_height() * scale)
@@ -95,30 +539,275 @@ def load_image(path, scale=1):
         return image
     except Exception as e:
         print(f"Error loading image {path}: {e}")
-        surf = pygame.Surface((50, 50), pygame.SRCALPHA)
-        color = RED if "enemy" in path.lower() else BLUE
-        pygame.draw.rect(surf, color, (0, 0, 50, 50))
-        return surf
+        return placeholder_image(RED if "enemy" in path.lower() else BLUE)
+
+# Stand-in surfaces for missing images, one per color and size
+placeholder_images = {}
+
+def placeholder_image(color=None, size=(50, 50)):
+    key = (color, size)
+    image = placeholder_images.get(key)
+    if image is None:
+        image = pygame.Surface(size, pygame.SRCALPHA)
+        if color is not None:
+            image.fill(color)
+        placeholder_images[key] = image
+    return image
+
+# Image files of an animation folder, in frame order
+def animation_files(folder_path):
+    files = sorted([f for f in os.listdir(folder_path) if f.endswith(('.png', '.jpg', '.jpeg'))],
+                  key=lambda x: int(''.join(filter(str.isdigit, x)) or 0))
+    return [os.path.join(folder_path, filename) for filename in files]
 
 # Load all animation frames from a folder
 def load_animation_frames(folder_path, scale=1):
+    packed = asset_pack.animation(folder_path, scale)
+    if packed:
+        return packed
     frames = []
     try:
-        files = sorted([f for f in os.listdir(folder_path) if f.endswith(('.png', '.jpg', '.jpeg'))],
-                      key=lambda x: int(''.join(filter(str.isdigit, x)) or 0))
-        
-        for filename in files:
-            frame = load_image(os.path.join(folder_path, filename), scale)
+        for path in animation_files(folder_path):
+            frame = load_image(path, scale)
             frames.append(frame)
     except Exception as e:
         print(f"Error loading animation frames from {folder_path}: {e}")
-        frames = [
-            pygame.Surface((50, 50), pygame.SRCALPHA),
-            pygame.Surface((50, 50), pygame.SRCALPHA)
-        ]
+        frames = [placeholder_image(), placeholder_image()]
     
     return frames
 
+# One large surface of an atlas, filled shelf by shelf from the top
+class AtlasPage:
+    def __init__(self, size, padding):
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.width, self.height = size
+        self.padding = padding
+        self.shelves = []  # [y, height, next free x]
+        self.used_height = 0
+        self.used_area = 0
+        
+    def insert(self, width, height):
+        # Best fit: the lowest shelf that still has room, else open a new one
+        padded_width = width + self.padding
+        padded_height = height + self.padding
+        best = None
+        for shelf in self.shelves:
+            if padded_height <= shelf[1] and shelf[2] + padded_width <= self.width:
+                if best is None or shelf[1] < best[1]:
+                    best = shelf
+        if best is None:
+            if self.used_height + padded_height > self.height or padded_width > self.width:
+                return None
+            best = [self.used_height, padded_height, 0]
+            self.shelves.append(best)
+            self.used_height += padded_height
+        x = best[2]
+        best[2] += padded_width
+        self.used_area += width * height
+        return pygame.Rect(x, best[0], width, height)
+
+# Packs the frames of each entity type into a few large pages and hands back
+# subsurfaces, so sprites of one type all blit from the same source surface
+class TextureAtlas:
+    def __init__(self, page_size=ATLAS_PAGE_SIZE, padding=1, enabled=USE_TEXTURE_ATLAS):
+        self.page_size = page_size
+        self.padding = padding
+        self.enabled = enabled
+        self.pages = {}  # group -> [AtlasPage]
+        # Source surface -> subsurface. Weak, so sources (decoded images,
+        # mapped pack pixels, flipped copies) are freed once copied in.
+        self.packed = weakref.WeakKeyDictionary()
+        self.frames = 0
+        self.files = {}  # (path, scale) -> packed image
+        
+    def pack(self, images, group="misc"):
+        if not self.enabled:
+            return list(images)
+        images = list(images)
+        # Tallest first keeps the shelves tight
+        order = sorted(range(len(images)), key=lambda i: images[i].get_height(), reverse=True)
+        packed = list(images)
+        for i in order:
+            packed[i] = self.pack_image(images[i], group)
+        return packed
+        
+    def pack_image(self, image, group="misc"):
+        if image is None or not self.enabled:
+            return image
+        packed = self.packed.get(image)
+        if packed is not None:
+            return packed
+        if image in placeholder_images.values():
+            return image
+        width, height = image.get_size()
+        if width + self.padding > self.page_size or height + self.padding > self.page_size:
+            return image
+        pages = self.pages.setdefault(group, [])
+        rect = None
+        for page in pages:
+            rect = page.insert(width, height)
+            if rect is not None:
+                break
+        if rect is None:
+            page = AtlasPage((self.page_size, self.page_size), self.padding)
+            pages.append(page)
+            rect = page.insert(width, height)
+        page.surface.blit(image, rect, special_flags=pygame.BLEND_RGBA_MAX)
+        packed = page.surface.subsurface(rect)
+        self.packed[image] = packed
+        self.frames += 1
+        return packed
+        
+    def pack_file(self, path, scale=1, group="misc"):
+        # Without an asset pack, load_image() scales a new surface on every
+        # call, so images loaded by path are packed once per (path, scale)
+        key = (path, scale)
+        packed = self.files.get(key)
+        if packed is None:
+            packed = self.pack_image(load_image(path, scale), group)
+            self.files[key] = packed
+        return packed
+        
+    def clear(self):
+        self.pages.clear()
+        self.packed.clear()
+        self.files.clear()
+        self.frames = 0
+        
+    def stats(self):
+        pages = [page for group in self.pages.values() for page in group]
+        area = len(pages) * self.page_size * self.page_size
+        return {
+            "groups": {group: len(group_pages) for group, group_pages in self.pages.items()},
+            "pages": len(pages),
+            "frames": self.frames,
+            "fill": round(sum(page.used_area for page in pages) / area, 3) if area else 0.0
+        }
+
+texture_atlas = TextureAtlas()
+
+# Atlas group for an animation folder: "player", "enemy", or "effects"
+def atlas_group(folder_path):
+    parts = folder_path.replace("\\", "/").split("/")
+    if len(parts) > 2 and parts[0] == "assets" and parts[1] in ("player", "enemy"):
+        return parts[1]
+    return "effects"
+
+# Animation frames plus a mirrored copy for left-facing sprites, built once
+class AnimationSet:
+    def __init__(self, frames, atlas=None, group="misc"):
+        self.atlas = atlas
+        self.group = group
+        self.frames = tuple(atlas.pack(frames, group) if atlas else frames)
+        self.flipped_frames = None
+        
+    def __len__(self):
+        return len(self.frames)
+        
+    def __getitem__(self, index):
+        return self.frames[index]
+        
+    def __iter__(self):
+        return iter(self.frames)
+        
+    def mirrored(self):
+        if self.flipped_frames is None:
+            flipped = [pygame.transform.flip(frame, True, False) for frame in self.frames]
+            self.flipped_frames = tuple(self.atlas.pack(flipped, self.group) if self.atlas else flipped)
+        return self.flipped_frames
+        
+    def frame(self, index, facing_right=True):
+        if facing_right:
+            return self.frames[index]
+        return self.mirrored()[index]
+
+# Shared animation frame cache, keyed by (folder, scale)
+class FrameCache:
+    def __init__(self):
+        self.frames = {}
+        self.hits = 0
+        self.misses = 0
+        
+    def get(self, folder_path, scale=1):
+        key = (folder_path, scale)
+        frames = self.frames.get(key)
+        if frames is None:
+            self.misses += 1
+            frames = AnimationSet(load_animation_frames(folder_path, scale), texture_atlas, atlas_group(folder_path))
+            self.frames[key] = frames
+        else:
+            self.hits += 1
+        return frames
+        
+    def prewarm(self, animations):
+        for folder_path, scale in animations:
+            self.get(folder_path, scale).mirrored()
+            
+    def clear(self):
+        self.frames.clear()
+        self.hits = 0
+        self.misses = 0
+        
+    def stats(self):
+        return {"entries": len(self.frames), "hits": self.hits, "misses": self.misses}
+
+frame_cache = FrameCache()
+
+# Rendered text cache with LRU eviction, keyed by (font, text, color, antialias)
+class TextCache:
+    def __init__(self, max_entries=256):
+        self.surfaces = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+        
+    def clear(self):
+        self.surfaces.clear()
+        
+    def stats(self):
+        return {"entries": len(self.surfaces), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+text_cache = TextCache()
+
+# Animation folders used by the game's sprites
+PLAYER_ANIMATIONS = [
+    ("assets/player/idle", 2),
+    ("assets/player/walk", 2),
+    ("assets/player/attack", 2)
+]
+ENEMY_ANIMATIONS = [
+    ("assets/enemy/run", 2),
+    ("assets/enemy/idle", 2),
+    ("assets/enemy/dead", 2),
+    ("assets/enemy/attack", 2)
+]
+
+# Single images used in gameplay, streamed in while the menu is up
+GAMEPLAY_IMAGES = [
+    ("assets/menu/HUD/MONEY PANEL/Money Icon.png", 3),
+    ("assets/menu/HUD/WEAPON ICONS/MG HUD.png", 2),
+    ("assets/menu/HUD/WEAPON ICONS/Pistol HUD.png", 2),
+    ("assets/menu/HUD/WEAPON ICONS/Flamethrower HUD.png", 2),
+    ("assets/menu/HUD/WEAPON ICONS/RPG HUD.png", 2)
+]
+
 # Button class for menu
 class Button:
     def __init__(self, x, y, width, height, text, color=LIGHT_GRAY, hover_color=WHITE, text_color=BLACK):
@@ -129,48 +818,167 @@ class Button:
         self.text_color = text_color
         self.is_hovered = False
         self.was_hovered = False
+        self.visible = True
+        self.images = None
+        
+    def render_states(self):
+        # Normal and hover images, rendered once on first draw
+        self.images = {}
+        for hovered, color in ((False, self.color), (True, self.hover_color)):
+            image = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+            local_rect = image.get_rect()
+            pygame.draw.rect(image, color, local_rect, border_radius=10)
+            pygame.draw.rect(image, BLACK, local_rect, 2, border_radius=10)
+            
+            text_surface = text_cache.render(button_font, self.text, self.text_color)
+            image.blit(text_surface, text_surface.get_rect(center=local_rect.center))
+            self.images[hovered] = image
         
     def draw(self, surface):
-        color = self.hover_color if self.is_hovered else self.color
-        pygame.draw.rect(surface, color, self.rect, border_radius=10)
-        pygame.draw.rect(surface, BLACK, self.rect, 2, border_radius=10)
-        
-        text_surface = button_font.render(self.text, True, self.text_color)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        surface.blit(text_surface, text_rect)
+        if self.images is None:
+            self.render_states()
+        return surface.blit(self.images[self.is_hovered], self.rect)
         
-    def check_hover(self, pos):
+    def set_hovered(self, hovered, quiet=False):
         self.was_hovered = self.is_hovered
-        self.is_hovered = self.rect.collidepoint(pos)
+        self.is_hovered = hovered
+        if hovered and not self.was_hovered and not quiet:
+            audio.play("button_hover")
+        return self.is_hovered != self.was_hovered
         
-        if self.is_hovered and not self.was_hovered:
-            try:
-                button_hover_sound.play()
-            except:
-                pass
-                
+    def check_hover(self, pos):
+        self.set_hovered(self.rect.collidepoint(pos))
         return self.is_hovered
         
     def is_clicked(self, pos, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             if self.rect.collidepoint(pos):
-                try:
-                    button_click_sound.play()
-                except:
-                    pass
+                audio.play("button_click")
                 return True
         return False
 
+# Static text, rendered once and again only when the text changes
+class Label:
+    def __init__(self, text, font, color, **position):
+        self.font = font
+        self.color = color
+        self.position = position  # Any Rect attribute, e.g. center=(x, y)
+        self.text = None
+        self.set_text(text)
+        
+    def set_text(self, text):
+        if text == self.text:
+            return False
+        self.text = text
+        self.image = text_cache.render(self.font, text, self.color)
+        self.rect = self.image.get_rect(**self.position)
+        return True
+        
+    def draw(self, surface):
+        return surface.blit(self.image, self.rect)
+
+# A retained menu screen: a backdrop, labels and buttons. Hover is hit-tested
+# only on MOUSEMOTION, and once the screen has been drawn in full only buttons
+# whose hover state changed are redrawn over a saved copy of the backdrop.
+# Animated screens (the scrolling main menu) repaint every frame instead.
+class MenuScreen:
+    def __init__(self, draw_backdrop, widgets, animated=False, on_enter=None):
+        self.draw_backdrop = draw_backdrop
+        self.widgets = widgets
+        self.animated = animated
+        self.on_enter = on_enter
+        self.labels = [widget for widget in widgets if not isinstance(widget, Button)]
+        self.buttons = [widget for widget in widgets if isinstance(widget, Button)]
+        self.backdrop = None
+        self.hovered = None
+        self.dirty = []
+        self.index_buttons()
+        
+    def index_buttons(self):
+        # Rect index of the visible buttons for Rect.collidelist
+        self.hit_buttons = [button for button in self.buttons if button.visible]
+        self.hit_rects = [button.rect for button in self.hit_buttons]
+        
+    def set_visible(self, button, visible):
+        if button.visible != visible:
+            button.visible = visible
+            if not visible and self.hovered is button:
+                button.set_hovered(False)
+                self.hovered = None
+            self.index_buttons()
+            self.invalidate()
+            
+    def invalidate(self):
+        self.backdrop = None
+        
+    def enter(self, pos, game=None):
+        if self.on_enter:
+            self.on_enter(game)
+        self.invalidate()
+        # Buttons are shared between screens, so start from a clean hover state
+        for button in self.buttons:
+            button.set_hovered(False)
+        self.hovered = None
+        self.hover(pos, quiet=True)
+        self.dirty = []
+        
+    def hit_test(self, pos):
+        index = pygame.Rect(pos, (1, 1)).collidelist(self.hit_rects)
+        return self.hit_buttons[index] if index >= 0 else None
+        
+    def hover(self, pos, quiet=False):
+        button = self.hit_test(pos)
+        if button is self.hovered:
+            return
+        if self.hovered is not None:
+            self.hovered.set_hovered(False)
+            self.dirty.append(self.hovered)
+        if button is not None:
+            button.set_hovered(True, quiet)
+            self.dirty.append(button)
+        self.hovered = button
+        
+    def handle_event(self, event):
+        # Returns the button clicked by this event, if any
+        if event.type == pygame.MOUSEMOTION:
+            self.hover(event.pos)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            button = self.hit_test(event.pos)
+            if button is not None:
+                audio.play("button_click")
+            return button
+        return None
+        
+    def draw(self, surface, game=None, full=False):
+        # Returns the rects that changed, or None after a full redraw
+        if full or self.animated or self.backdrop is None:
+            surface.fill(BLACK)
+            self.draw_backdrop(surface, game)
+            for label in self.labels:
+                label.draw(surface)
+            if not self.animated:
+                self.backdrop = surface.copy()
+            for button in self.hit_buttons:
+                button.draw(surface)
+            self.dirty = []
+            return None
+        rects = []
+        for button in self.dirty:
+            surface.blit(self.backdrop, button.rect, button.rect)
+            rects.append(button.draw(surface))
+        self.dirty = []
+        return rects
+
 # Money System
 class MoneySystem:
     def __init__(self):
-        self.money = 20000
-        self.kill_reward = 10
-        self.level_up_bonus = 50
+        self.money = STARTING_MONEY
+        self.kill_reward = KILL_REWARD
+        self.level_up_bonus = LEVEL_UP_BONUS
         self.coin_image = None
         
         try:
-            self.coin_image = load_image("assets/menu/HUD/MONEY PANEL/Money Icon.png", 3)
+            self.coin_image = texture_atlas.pack_file("assets/menu/HUD/MONEY PANEL/Money Icon.png", 3, "icons")
         except:
             print("Error loading Money Image offfff")
         
@@ -186,20 +994,22 @@ class MoneySystem:
     def enemy_killed(self):
         self.add_money(self.kill_reward)
         
-    def level_up(self):
-        self.add_money(self.level_up_bonus)
+    def level_up(self, levels=1):
+        self.add_money(self.level_up_bonus * levels)
         
     def draw(self, surface):
         if self.coin_image:
             coin_rect = self.coin_image.get_rect()
             coin_rect.x = SCREEN_WIDTH - 200
             coin_rect.y = 70
-            surface.blit(self.coin_image, coin_rect)
-            money_text = menu_font.render(f": ${self.money}", True, YELLOW)
-            surface.blit(money_text, (SCREEN_WIDTH - 170, 70))
+            money_text = text_cache.render(menu_font, f": ${self.money}", YELLOW)
+            return [
+                surface.blit(self.coin_image, coin_rect),
+                surface.blit(money_text, (SCREEN_WIDTH - 170, 70))
+            ]
         else:
-            money_text = menu_font.render(f"Money: ${self.money}", True, YELLOW)
-            surface.blit(money_text, (SCREEN_WIDTH - 200, 70))
+            money_text = text_cache.render(menu_font, f"Money: ${self.money}", YELLOW)
+            return [surface.blit(money_text, (SCREEN_WIDTH - 200, 70))]
 
 # Weapon Class
 class Weapon:
@@ -207,20 +1017,20 @@ class Weapon:
         self.name = name
         self.damage = damage
         self.price = price
-        self.image = load_image(image_path, 2) if image_path else None
+        self.image = texture_atlas.pack_file(image_path, 2, "icons") if image_path else None
         self.owned = 0
         
     def draw(self, surface, x, y):
         if self.image:
             surface.blit(self.image, (x, y))
         
-        text = button_font.render(f"{self.name} (DMG: {self.damage})", True, WHITE)
+        text = text_cache.render(button_font, f"{self.name} (DMG: {self.damage})", WHITE)
         surface.blit(text, (x + 60, y + 10))
         
-        price_text = button_font.render(f"${self.price}", True, YELLOW)
+        price_text = text_cache.render(button_font, f"${self.price}", YELLOW)
         surface.blit(price_text, (x + 60, y + 40))
         
-        owned_text = button_font.render(f"Owned: {self.owned}", True, GREEN)
+        owned_text = text_cache.render(button_font, f"Owned: {self.owned}", GREEN)
         surface.blit(owned_text, (x + 60, y + 70))
 
 # Shop System
@@ -232,6 +1042,7 @@ class ShopSystem:
             Weapon("Shotgun", 30, 200, "assets/menu/HUD/WEAPON ICONS/Flamethrower HUD.png"),
             Weapon("Rifle", 40, 350, "assets/menu/HUD/WEAPON ICONS/RPG HUD.png")
         ]
+        self.view = None
         
     def buy_weapon(self, index, player, money_system):
         weapon = self.weapons[index]
@@ -249,56 +1060,115 @@ class ShopSystem:
             return True
         return False
         
+    def get_view(self):
+        if self.view is None:
+            self.view = ShopView(self)
+        return self.view
+        
     def draw(self, surface, money_system):
-        # Semi-transparent background
-        s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        s.fill((0, 0, 0, 200))
-        surface.blit(s, (0, 0))
-        
-        # Shop title
-        title = title_font.render("WEAPON SHOP", True, YELLOW)
-        surface.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 50))
-        
-        # Current money
-        money_text = menu_font.render(f"Your Money: ${money_system.money}", True, WHITE)
-        surface.blit(money_text, (SCREEN_WIDTH//2 - money_text.get_width()//2, 120))
-        
-        # Weapons list
-        for i, weapon in enumerate(self.weapons):
-            y_pos = 180 + i * 120
-            weapon.draw(surface, SCREEN_WIDTH//2 - 150, y_pos)
-            
-            # Buy button
-            buy_btn = Button(SCREEN_WIDTH//2 + 100, y_pos + 20, 80, 30, "Buy", GREEN)
-            buy_btn.draw(surface)
+        return self.get_view().draw(surface, money_system)
+
+# Retained shop overlay: the layout, buttons and weapon rows are built once
+class ShopView:
+    def __init__(self, shop):
+        self.shop = shop
+        self.left = SCREEN_WIDTH//2 - 150
+        self.row_top = 180
+        self.row_height = 120
+        
+        # Semi-transparent background and title
+        self.overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+        self.overlay.fill((0, 0, 0, 200))
+        title = text_cache.render(title_font, "WEAPON SHOP", YELLOW)
+        self.overlay.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 50))
+        
+        self.buy_buttons = []
+        self.sell_buttons = []
+        self.rows = []
+        self.row_states = []
+        for i in range(len(shop.weapons)):
+            y_pos = self.row_top + i * self.row_height
+            self.buy_buttons.append(Button(SCREEN_WIDTH//2 + 100, y_pos + 20, 80, 30, "Buy", GREEN))
+            self.sell_buttons.append(Button(SCREEN_WIDTH//2 + 100, y_pos + 60, 80, 30, "Sell", RED))
+            self.rows.append(pygame.Surface((SCREEN_WIDTH - self.left, self.row_height), pygame.SRCALPHA))
+            self.row_states.append(None)
+        self.exit_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT - 80, 200, 50, "Exit Shop")
+        
+        self.money_shown = None
+        self.money_text = None
+        
+    def update_rows(self):
+        # Only re-render rows whose weapon changed since the last draw
+        for i, weapon in enumerate(self.shop.weapons):
+            state = (weapon.name, weapon.damage, weapon.price, weapon.owned)
+            if state != self.row_states[i]:
+                row = self.rows[i]
+                row.fill((0, 0, 0, 0))
+                weapon.draw(row, 0, 0)
+                self.row_states[i] = state
+                
+    def update_money(self, money):
+        if money != self.money_shown:
+            self.money_text = text_cache.render(menu_font, f"Your Money: ${money}", WHITE)
+            self.money_shown = money
             
-            # Sell button
-            sell_btn = Button(SCREEN_WIDTH//2 + 100, y_pos + 60, 80, 30, "Sell", RED)
-            sell_btn.draw(surface)
+    def check_hover(self, pos):
+        self.exit_button.check_hover(pos)
+        
+    def hit_test(self, pos):
+        for i in range(len(self.shop.weapons)):
+            if self.buy_buttons[i].rect.collidepoint(pos):
+                return "buy", i
+            if self.sell_buttons[i].rect.collidepoint(pos):
+                return "sell", i
+        if self.exit_button.rect.collidepoint(pos):
+            return "exit", None
+        return None, None
         
-        # Exit button
-        exit_btn = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT - 80, 200, 50, "Exit Shop")
-        exit_btn.draw(surface)
+    def draw(self, surface, money_system):
+        self.update_rows()
+        self.update_money(money_system.money)
+        
+        surface.blit(self.overlay, (0, 0))
+        surface.blit(self.money_text, (SCREEN_WIDTH//2 - self.money_text.get_width()//2, 120))
         
-        return exit_btn
+        for i, row in enumerate(self.rows):
+            surface.blit(row, (self.left, self.row_top + i * self.row_height))
+            self.buy_buttons[i].draw(surface)
+            self.sell_buttons[i].draw(surface)
+        
+        self.exit_button.draw(surface)
+        return self.exit_button
 
 # Level System
+# XP needed to go from each level to the next, indexed by level (index 0 is
+# unused). The entry for the last level is only shown in the HUD.
+def xp_table(first=XP_FIRST_LEVEL, growth=XP_GROWTH, max_level=MAX_LEVEL):
+    table = [0, first]
+    while len(table) <= max_level:
+        table.append(int(table[-1] * growth))
+    return table
+
+XP_TABLE = xp_table()
+
 class LevelSystem:
     def __init__(self):
         self.level = 1
         self.xp = 0
-        self.xp_to_next_level = 100
+        self.xp_to_next_level = XP_TABLE[1]
         self.total_kills = 0
         
     def add_xp(self, amount):
+        # Returns the number of levels gained, as one award can cross several
         self.xp += amount
         self.total_kills += 1
-        if self.xp >= self.xp_to_next_level and self.level < 100:
-            self.level += 1
+        levels = 0
+        while self.level < MAX_LEVEL and self.xp >= self.xp_to_next_level:
             self.xp -= self.xp_to_next_level
-            self.xp_to_next_level = int(self.xp_to_next_level * 1.2)
-            return True
-        return False
+            self.level += 1
+            self.xp_to_next_level = XP_TABLE[self.level]
+            levels += 1
+        return levels
     
     def draw(self, surface):
         xp_bar_width = 200
@@ -306,47 +1176,280 @@ class LevelSystem:
         xp_bar_x = SCREEN_WIDTH - xp_bar_width - 10
         xp_bar_y = 10
         
-        pygame.draw.rect(surface, (50, 50, 50), (xp_bar_x, xp_bar_y, xp_bar_width, xp_bar_height))
+        bar_rect = pygame.draw.rect(surface, (50, 50, 50), (xp_bar_x, xp_bar_y, xp_bar_width, xp_bar_height))
         xp_progress = (self.xp / self.xp_to_next_level) * xp_bar_width
         pygame.draw.rect(surface, YELLOW, (xp_bar_x, xp_bar_y, xp_progress, xp_bar_height))
         
-        font = pygame.font.SysFont(None, 30)
-        level_text = font.render(f"Level: {self.level}", True, WHITE)
-        xp_text = font.render(f"XP: {self.xp}/{self.xp_to_next_level}", True, WHITE)
-        kills_text = font.render(f"Kills: {self.total_kills}", True, WHITE)
+        level_text = text_cache.render(hud_font, f"Level: {self.level}", WHITE)
+        xp_text = text_cache.render(hud_font, f"XP: {self.xp}/{self.xp_to_next_level}", WHITE)
+        kills_text = text_cache.render(hud_font, f"Kills: {self.total_kills}", WHITE)
         
-        surface.blit(level_text, (10, 10))
-        surface.blit(xp_text, (10, 40))
-        surface.blit(kills_text, (10, 70))
+        return [
+            bar_rect,
+            surface.blit(level_text, (10, 10)),
+            surface.blit(xp_text, (10, 40)),
+            surface.blit(kills_text, (10, 70))
+        ]
 
-# Load background
-try:
-    background = pygame.image.load("assets/mohit/city 1/10.png").convert()
-    background = pygame.transform.scale(background, (SCREEN_WIDTH, SCREEN_HEIGHT))
-except:
-    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-    background.fill((100, 100, 100))
+# Backgrounds, loaded by load_backgrounds()
+background = None
+menu_bg = None
 
-# Menu background
-try:
-    menu_bg = pygame.image.load("assets/mohit/city 1/10.png").convert()
-    menu_bg = pygame.transform.scale(menu_bg, (SCREEN_WIDTH, SCREEN_HEIGHT))
-except:
-    menu_bg = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-    menu_bg.fill((50, 50, 100))
+# The background tiled across the screen and scrolled for a camera at view_x
+def draw_world_background(surface, view_x=0):
+    offset = int(view_x * BACKGROUND_PARALLAX) % SCREEN_WIDTH
+    surface.blit(background, (-offset, 0))
+    if offset:
+        surface.blit(background, (SCREEN_WIDTH - offset, 0))
 
 # Menu movement variables
-menu_bg_width = menu_bg.get_width()
+menu_bg_width = SCREEN_WIDTH
 menu_bg_x = 0
 menu_scroll_speed = 1
 
+def load_backgrounds():
+    global background, menu_bg, menu_bg_width
+    # The game and the menu share one background image, decoded once
+    packed = asset_pack.image(BACKGROUND_IMAGE, "screen")
+    if packed is not None:
+        background = menu_bg = packed.convert()
+        menu_bg_width = menu_bg.get_width()
+        return
+    try:
+        background = asset_loader.take(BACKGROUND_IMAGE).convert()
+        background = pygame.transform.scale(background, (SCREEN_WIDTH, SCREEN_HEIGHT))
+        menu_bg = background
+    except:
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        background.fill((100, 100, 100))
+        menu_bg = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        menu_bg.fill((50, 50, 100))
+    
+    menu_bg_width = menu_bg.get_width()
+
+# Sprites kept sorted by rect.x. The arena is a single ground line, so range,
+# nearest and collision queries are a bisect plus a short scan.
+class AxisIndex:
+    def __init__(self):
+        self.keys = []
+        self.items = []
+        self.positions = {}
+        self.max_width = 0
+        
+    def __len__(self):
+        return len(self.items)
+        
+    def __contains__(self, item):
+        return item in self.positions
+        
+    def insert(self, item):
+        x = item.rect.x
+        i = bisect_right(self.keys, x)
+        self.keys.insert(i, x)
+        self.items.insert(i, item)
+        self.positions[item] = x
+        self.max_width = max(self.max_width, item.rect.width)
+        
+    def remove(self, item):
+        x = self.positions.pop(item, None)
+        if x is None:
+            return False
+        i = bisect_left(self.keys, x)
+        while self.items[i] is not item:
+            i += 1
+        del self.keys[i]
+        del self.items[i]
+        return True
+        
+    def update(self, item):
+        if self.positions.get(item, item.rect.x) != item.rect.x:
+            self.remove(item)
+            self.insert(item)
+            
+    def clear(self):
+        self.keys.clear()
+        self.items.clear()
+        self.positions.clear()
+        
+    def in_x_range(self, low, high):
+        # Items with low < rect.x < high
+        return self.items[bisect_right(self.keys, low):bisect_left(self.keys, high)]
+        
+    def nearest_x(self, x, predicate=None):
+        # Walk outwards from x, always taking the closer side next. Items at
+        # the same x go in spawn order (ai_seq), not the order they were
+        # inserted, so cached targets match the horde backend.
+        right = bisect_left(self.keys, x)
+        left = right - 1
+        keys = self.keys
+        while left >= 0 or right < len(keys):
+            if right >= len(keys) or (left >= 0 and x - keys[left] <= keys[right] - x):
+                start = bisect_left(keys, keys[left], 0, left)
+                candidates = self.items[start:left + 1]
+                left = start - 1
+            else:
+                end = bisect_right(keys, keys[right], right)
+                candidates = self.items[right:end]
+                right = end
+            best = None
+            for item in candidates:
+                if (predicate is None or predicate(item)) and (best is None or item.ai_seq < best.ai_seq):
+                    best = item
+            if best is not None:
+                return best
+        return None
+        
+    def colliding(self, rect):
+        candidates = self.in_x_range(rect.left - self.max_width, rect.right)
+        return [item for item in candidates if rect.colliderect(item.rect)]
+
+# Uniform grid fallback for sprites that move freely in two dimensions
+class GridIndex:
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.item_cells = {}
+        self.columns = []  # Sorted occupied columns, so nearest_x walks outward from x
+        self.column_cells = {}  # column -> number of item cells in it
+        self.positions = {}  # item -> (x when indexed, insert count), the order AxisIndex keeps
+        self.inserted = 0
+        self.top_row = 0
+        self.bottom_row = 0
+        
+    def __len__(self):
+        return len(self.item_cells)
+        
+    def __contains__(self, item):
+        return item in self.item_cells
+        
+    def cells_for(self, rect):
+        size = self.cell_size
+        return [(cx, cy)
+                for cx in range(rect.left // size, (rect.right - 1) // size + 1)
+                for cy in range(rect.top // size, (rect.bottom - 1) // size + 1)]
+        
+    def insert(self, item):
+        cells = self.cells_for(item.rect)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(item)
+            count = self.column_cells.get(cell[0], 0)
+            if not count:
+                self.columns.insert(bisect_left(self.columns, cell[0]), cell[0])
+            self.column_cells[cell[0]] = count + 1
+            self.top_row = min(self.top_row, cell[1])
+            self.bottom_row = max(self.bottom_row, cell[1])
+        self.item_cells[item] = cells
+        self.inserted += 1
+        self.positions[item] = (item.rect.x, self.inserted)
+        
+    def remove(self, item):
+        cells = self.item_cells.pop(item, None)
+        if cells is None:
+            return False
+        del self.positions[item]
+        for cell in cells:
+            bucket = self.cells[cell]
+            bucket.remove(item)
+            if not bucket:
+                del self.cells[cell]
+            count = self.column_cells[cell[0]] - 1
+            if count:
+                self.column_cells[cell[0]] = count
+            else:
+                del self.column_cells[cell[0]]
+                del self.columns[bisect_left(self.columns, cell[0])]
+        return True
+        
+    def update(self, item):
+        # Like AxisIndex, an item only moves behind others at its x when its x changes
+        cells = self.item_cells.get(item)
+        if cells is None:
+            return
+        position = self.positions[item]
+        if cells != self.cells_for(item.rect):
+            self.remove(item)
+            self.insert(item)
+            if position[0] == item.rect.x:
+                self.positions[item] = position
+        elif position[0] != item.rect.x:
+            self.inserted += 1
+            self.positions[item] = (item.rect.x, self.inserted)
+            
+    def clear(self):
+        self.cells.clear()
+        self.item_cells.clear()
+        self.columns.clear()
+        self.column_cells.clear()
+        self.positions.clear()
+        
+    def query_columns(self, first_column, last_column):
+        found = {}
+        for cx in range(first_column, last_column + 1):
+            for cy in range(self.top_row, self.bottom_row + 1):
+                for item in self.cells.get((cx, cy), ()):
+                    found[item] = None
+        return list(found)
+        
+    def in_x_range(self, low, high):
+        size = self.cell_size
+        candidates = self.query_columns(low // size, high // size + 1)
+        found = [item for item in candidates if low < self.positions[item][0] < high]
+        found.sort(key=self.positions.get)
+        return found
+        
+    def nearest_x(self, x, predicate=None):
+        if not self.item_cells:
+            return None
+        size = self.cell_size
+        column = x // size
+        columns = self.columns
+        right = bisect_left(columns, column)
+        left = right - 1
+        best = None
+        best_rank = None
+        best_distance = float('inf')
+        # Visit occupied columns in order of distance from x's column
+        while left >= 0 or right < len(columns):
+            if right < len(columns) and (left < 0 or columns[right] - column <= column - columns[left]):
+                cx = columns[right]
+                right += 1
+            else:
+                cx = columns[left]
+                left -= 1
+            # Anything in this column or farther is at least this far away
+            if best_distance <= (abs(cx - column) - 1) * size:
+                break
+            for item in self.query_columns(cx, cx):
+                # Same order as AxisIndex: closest, then the left side, then spawn order
+                distance = abs(item.rect.x - x)
+                rank = (distance, item.rect.x > x, item.ai_seq)
+                if (best_rank is None or rank < best_rank) and (predicate is None or predicate(item)):
+                    best = item
+                    best_rank = rank
+                    best_distance = distance
+        return best
+        
+    def colliding(self, rect):
+        found = {}
+        for cell in self.cells_for(rect):
+            for item in self.cells.get(cell, ()):
+                if item not in found and rect.colliderect(item.rect):
+                    found[item] = None
+        return sorted(found, key=self.positions.get)
+
+def make_spatial_index(kind=SPATIAL_INDEX):
+    if kind == "grid":
+        return GridIndex()
+    return AxisIndex()
+
 # Player class
 class Player(pygame.sprite.Sprite):
-    def __init__(self, x, y):
+    def __init__(self, game, x, y):
         super().__init__()
-        self.idle_frames = load_animation_frames("assets/player/idle", 2)
-        self.run_frames = load_animation_frames("assets/player/walk", 2)
-        self.attack_frames = load_animation_frames("assets/player/attack", 2)
+        self.game = game
+        self.idle_frames = frame_cache.get("assets/player/idle", 2)
+        self.run_frames = frame_cache.get("assets/player/walk", 2)
+        self.attack_frames = frame_cache.get("assets/player/attack", 2)
         
         self.current_frames = self.idle_frames
         self.current_frame = 0
@@ -365,10 +1468,11 @@ class Player(pygame.sprite.Sprite):
         self.on_ground = False
         self.health = 100
         self.max_health = 100
-        self.attack_power = 10
+        self.attack_power = PLAYER_ATTACK_POWER
         self.melee_attack_cooldown = 0
         self.current_weapon = None
         self.weapons = []
+        self.move_direction = 0
         
     def add_weapon(self, weapon):
         if weapon not in self.weapons:
@@ -384,12 +1488,11 @@ class Player(pygame.sprite.Sprite):
         self.velocity_y += GRAVITY
         dy += self.velocity_y
         
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+        if self.move_direction > 0:
             dx = self.speed
             self.is_running = True
             self.facing_right = True
-        elif keys[pygame.K_a] or keys[pygame.K_LEFT]:
+        elif self.move_direction < 0:
             dx = -self.speed
             self.is_running = True
             self.facing_right = False
@@ -406,8 +1509,8 @@ class Player(pygame.sprite.Sprite):
         
         if self.rect.left < 0:
             self.rect.left = 0
-        if self.rect.right > SCREEN_WIDTH:
-            self.rect.right = SCREEN_WIDTH
+        if self.rect.right > self.game.world.width:
+            self.rect.right = self.game.world.width
             
         self.animation_time += self.animation_speed
         if self.animation_time >= 1:
@@ -421,11 +1524,7 @@ class Player(pygame.sprite.Sprite):
                 self.current_frames = self.idle_frames
             
             self.current_frame = (self.current_frame + 1) % len(self.current_frames)
-            self.image = self.current_frames[self.current_frame]
-            
-            if not self.facing_right:
-                self.image = pygame.transform.flip(self.image, True, False)
-            
+            self.image = self.current_frames.frame(self.current_frame, self.facing_right)
             self.animation_time = 0
             
         if self.attack_cooldown > 0:
@@ -436,10 +1535,7 @@ class Player(pygame.sprite.Sprite):
     
     def ranged_attack(self):
         if self.attack_cooldown == 0 and not self.is_attacking:
-            try:
-                attack_sound.play()
-            except:
-                pass
+            audio.play("attack")
             self.attack_cooldown = 30
             self.is_attacking = True
             self.current_frame = 0
@@ -448,97 +1544,261 @@ class Player(pygame.sprite.Sprite):
         
     def melee_attack(self):
         if self.melee_attack_cooldown == 0:
-            try:
-                attack_sound.play()
-            except:
-                pass
+            audio.play("attack")
             self.melee_attack_cooldown = 20
             self.is_attacking = True
             self.current_frame = 0
             
-            for enemy in enemies:
-                if not enemy.is_dead and abs(self.rect.x - enemy.rect.x) < ATTACK_RANGE:
+            for enemy in self.game.enemy_index.in_x_range(self.rect.x - ATTACK_RANGE, self.rect.x + ATTACK_RANGE):
+                if not enemy.is_dead:
                     if enemy.take_damage(self.attack_power * 1.5):
-                        if level_system.add_xp(10):
-                            player.attack_power += 2
+                        self.attack_power += MELEE_LEVEL_POWER * self.game.level_system.add_xp(KILL_XP)
             return True
         return False
 
     def jump(self):
         if self.on_ground:
-            try:
-                jump_sound.play()
-            except:
-                pass
+            audio.play("jump")
             self.velocity_y = -15
     
-    def draw_health(self, surface):
+    def draw_health(self, surface, pos=None):
         health_bar_width = 100
         health_bar_height = 10
-        health_bar_x = self.rect.x
-        health_bar_y = self.rect.y - 15
+        health_bar_x, health_bar_y = pos or self.rect.topleft
+        health_bar_y -= 15
         
-        pygame.draw.rect(surface, (255, 0, 0), (health_bar_x, health_bar_y, health_bar_width, health_bar_height))
+        bar_rect = pygame.draw.rect(surface, (255, 0, 0), (health_bar_x, health_bar_y, health_bar_width, health_bar_height))
         health_progress = (self.health / self.max_health) * health_bar_width
         pygame.draw.rect(surface, (0, 255, 0), (health_bar_x, health_bar_y, health_progress, health_bar_height))
+        return bar_rect
+
+# Reusable objects: acquire() takes a free object, or builds one, and calls
+# its reset(*args); release() gives it back. Up to high_water free objects are
+# kept and any beyond that are dropped.
+class ObjectPool:
+    def __init__(self, factory, prewarm=0, high_water=POOL_HIGH_WATER):
+        self.factory = factory
+        self.high_water = high_water
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.discarded = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.prewarm(prewarm)
+        
+    def prewarm(self, count):
+        while len(self.free) < min(count, self.high_water):
+            self.free.append(self.factory())
+            self.created += 1
+            
+    def acquire(self, *args):
+        if self.free:
+            item = self.free.pop()
+            self.reused += 1
+        else:
+            item = self.factory()
+            self.created += 1
+        item.reset(*args)
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return item
+        
+    def release(self, item):
+        # Objects built outside the pool may be released into it too
+        self.released += 1
+        self.in_use = max(0, self.in_use - 1)
+        if len(self.free) < self.high_water:
+            self.free.append(item)
+        else:
+            self.discarded += 1
+            
+    def stats(self):
+        return {
+            "free": len(self.free),
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "created": self.created,
+            "reused": self.reused,
+            "released": self.released,
+            "discarded": self.discarded
+        }
+
+# Spreads agent decision making ("thinking") over ticks. Each kind of agent
+# thinks at its own rate, with phases handed out round-robin so agents
+# spawned together think on different ticks, and acts on its last decision in
+# between. At most `budget` agents think per tick. Due agents beyond that wait,
+# most overdue first. The budget counts thinks rather than seconds, so a run
+# does not depend on machine speed and replays stay exact. Time spent is still
+# measured for the stats.
+class AIScheduler:
+    def __init__(self, game, think_hz=AI_THINK_HZ, budget=AI_THINK_BUDGET, history=600):
+        self.game = game
+        self.think_hz = dict(think_hz)
+        self.budget = budget
+        self.history = deque(maxlen=history)  # (thinks, deferred, seconds) per tick
+        self.clear()
+        
+    def clear(self):
+        self.queues = {kind: [] for kind in self.think_hz}  # heaps of (next think tick, seq, agent)
+        self.phases = {kind: 0 for kind in self.think_hz}
+        self.seq = 0
+        self.thinks = 0
+        self.deferred = 0
+        self.seconds = 0.0
+        self.history.clear()
+        
+    def interval(self, kind):
+        # Ticks between thinks; the load governor may stretch it
+        interval = max(1, round(TICK_RATE / self.think_hz[kind]))
+        return interval * self.game.quality["ai_interval_scale"]
+        
+    def first_think(self, kind):
+        phase = self.phases[kind] % self.interval(kind)
+        self.phases[kind] += 1
+        return self.game.ticks + phase
+        
+    def register(self, kind, agent):
+        self.seq += 1
+        agent.ai_seq = self.seq
+        heapq.heappush(self.queues[kind], (self.first_think(kind), self.seq, agent))
+        
+    def suspend(self, kind, agents):
+        # Parked agents leave the queue; otherwise their entries would be valid
+        # again once they wake and they would think twice per interval
+        queue = self.queues[kind]
+        kept = [entry for entry in queue if entry[2] not in agents]
+        if len(kept) != len(queue):
+            heapq.heapify(kept)
+            self.queues[kind] = kept
+            
+    def resume(self, kind, agent):
+        # An agent back from a dormant chunk keeps its identity and thinks straight away
+        heapq.heappush(self.queues[kind], (self.game.ticks, agent.ai_seq, agent))
+        
+    def begin_tick(self):
+        self.thinks = 0
+        self.deferred = 0
+        self.seconds = 0.0
+        
+    def run(self, kind):
+        # Let due agents of one kind think, within what is left of the budget
+        queue = self.queues[kind]
+        ticks = self.game.ticks
+        if not queue or queue[0][0] > ticks:
+            return
+        start = time.perf_counter()
+        interval = self.interval(kind)
+        while queue and queue[0][0] <= ticks:
+            if self.thinks >= self.budget:
+                self.deferred += sum(1 for entry in queue if entry[0] <= ticks)
+                break
+            next_think, seq, agent = heapq.heappop(queue)
+            # Skip agents that were removed, reused, or are dying
+            if agent.ai_seq != seq or not agent.alive() or getattr(agent, "is_dead", False):
+                continue
+            agent.think()
+            self.thinks += 1
+            heapq.heappush(queue, (ticks + interval, seq, agent))
+        self.seconds += time.perf_counter() - start
+        
+    def run_horde(self, horde):
+        start = time.perf_counter()
+        thinks, deferred = horde.think(self.budget - self.thinks, self.interval("enemy"))
+        self.thinks += thinks
+        self.deferred += deferred
+        self.seconds += time.perf_counter() - start
+        
+    def end_tick(self):
+        self.history.append((self.thinks, self.deferred, self.seconds))
+        profiler.set_counter("ai_thinks", self.thinks)
+        
+    def stats(self):
+        ticks = max(1, len(self.history))
+        return {
+            "intervals": {kind: self.interval(kind) for kind in self.think_hz},
+            "last_tick_thinks": self.thinks,
+            "average_thinks": round(sum(entry[0] for entry in self.history) / ticks, 2),
+            "peak_thinks": max((entry[0] for entry in self.history), default=0),
+            "deferred": sum(entry[1] for entry in self.history),
+            "average_ms": round(sum(entry[2] for entry in self.history) / ticks * 1000, 4)
+        }
 
 # Enemy class
 class Enemy(pygame.sprite.Sprite):
-    def __init__(self, x, y):
+    def __init__(self, game, x=None, y=None):
         super().__init__()
-        self.idle_frames = load_animation_frames("assets/enemy/run", 2)
-        self.run_frames = load_animation_frames("assets/enemy/idle", 2)
-        self.death_frames = load_animation_frames("assets/enemy/dead", 2)
-        self.attack_frames = load_animation_frames("assets/enemy/attack", 2)
+        self.game = game
+        self.idle_frames = frame_cache.get("assets/enemy/run", 2)
+        self.run_frames = frame_cache.get("assets/enemy/idle", 2)
+        self.death_frames = frame_cache.get("assets/enemy/dead", 2)
+        self.attack_frames = frame_cache.get("assets/enemy/attack", 2)
+        self.animation_speed = 0.1
+        self.max_health = 30
         
+        # Pooled enemies are reset when they are handed out
+        if x is not None:
+            self.reset(x, y)
+            
+    def reset(self, x, y):
         self.current_frames = self.idle_frames
         self.current_frame = 0
         self.image = self.current_frames[self.current_frame]
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
-        self.speed = random.randint(1, 3)
-        self.animation_speed = 0.1
+        self.speed = self.game.rng.randint(1, 3)
         self.animation_time = 0
-        self.health = 30
-        self.max_health = 30
+        self.health = self.max_health
         self.is_dead = False
         self.death_timer = 42
         self.facing_right = False
         self.attack_cooldown = 0
         self.attack_power = 5
         
+        # Decision from the last think: stand still until the first one
+        self.chase_dx = 0
+        self.in_range = False
+        self.game.ai.register("enemy", self)
+        
+    def think(self):
+        player = self.game.player
+        self.chase_dx = self.speed if self.rect.x < player.rect.x else -self.speed
+        self.in_range = abs(self.rect.x - player.rect.x) < ATTACK_RANGE
+        
     def update(self):
         if self.is_dead:
             self.death_timer -= 1
             if self.death_timer <= 0:
                 self.kill()
             
-            self.animation_time += self.animation_speed
-            if self.animation_time >= 1:
-                self.current_frame = (self.current_frame + 1) % len(self.current_frames)
-                if self.current_frame >= len(self.current_frames) - 1:
-                    self.current_frame = len(self.current_frames) - 1
-                self.image = self.current_frames[self.current_frame]
-                self.animation_time = 0
+            step = self.game.animation_step(self.rect.x)
+            if step == 1 or self.game.ticks % step == 0:
+                self.animation_time += self.animation_speed * step
+                if self.animation_time >= 1:
+                    self.current_frame = (self.current_frame + 1) % len(self.current_frames)
+                    if self.current_frame >= len(self.current_frames) - 1:
+                        self.current_frame = len(self.current_frames) - 1
+                    self.image = self.current_frames[self.current_frame]
+                    self.animation_time = 0
         else:
-            dx = self.speed if self.rect.x < player.rect.x else -self.speed
-            self.facing_right = dx > 0
+            # Chase or attack as decided at the last think
+            self.facing_right = self.chase_dx > 0
             
-            if abs(self.rect.x - player.rect.x) < ATTACK_RANGE and self.attack_cooldown == 0:
+            if self.in_range and self.attack_cooldown == 0:
                 self.attack()
             else:
-                self.rect.x += dx
+                self.rect.x += self.chase_dx
+                self.game.enemy_index.update(self)
             
-            self.animation_time += self.animation_speed
-            if self.animation_time >= 1:
-                self.current_frame = (self.current_frame + 1) % len(self.current_frames)
-                self.image = self.current_frames[self.current_frame]
-                
-                if not self.facing_right:
-                    self.image = pygame.transform.flip(self.image, True, False)
-                
-                self.animation_time = 0
+            step = self.game.animation_step(self.rect.x)
+            if step == 1 or self.game.ticks % step == 0:
+                self.animation_time += self.animation_speed * step
+                if self.animation_time >= 1:
+                    self.current_frame = (self.current_frame + 1) % len(self.current_frames)
+                    self.image = self.current_frames.frame(self.current_frame, self.facing_right)
+                    self.animation_time = 0
             
             if self.attack_cooldown > 0:
                 self.attack_cooldown -= 1
@@ -548,63 +1808,41 @@ class Enemy(pygame.sprite.Sprite):
         self.current_frames = self.attack_frames
         self.current_frame = 0
         
+        player = self.game.player
         if abs(self.rect.x - player.rect.x) < ATTACK_RANGE:
             player.health -= self.attack_power
     
+    def kill(self):
+        was_alive = self.alive()
+        self.game.enemy_index.remove(self)
+        super().kill()
+        if was_alive:
+            self.game.previous_positions.pop(self, None)
+            self.game.enemy_pool.release(self)
+        
     def take_damage(self, damage):
         self.health -= damage
         if self.health <= 0 and not self.is_dead:
-            money_system.enemy_killed()
-            try:
-                enemy_death_sound.play()
-            except:
-                pass
+            self.game.money_system.enemy_killed()
+            audio.play("enemy_death")
             self.is_dead = True
             self.current_frames = self.death_frames
             self.current_frame = 0
             return True
         return False
     
-    def draw_health(self, surface):
+    def draw_health(self, surface, pos=None):
         if not self.is_dead:
             health_bar_width = 50
             health_bar_height = 5
-            health_bar_x = self.rect.x
-            health_bar_y = self.rect.y - 10
+            health_bar_x, health_bar_y = pos or self.rect.topleft
+            health_bar_y -= 10
             
-            pygame.draw.rect(surface, (255, 0, 0), (health_bar_x, health_bar_y, health_bar_width, health_bar_height))
+            bar_rect = pygame.draw.rect(surface, (255, 0, 0), (health_bar_x, health_bar_y, health_bar_width, health_bar_height))
             health_progress = (self.health / self.max_health) * health_bar_width
             pygame.draw.rect(surface, (0, 255, 0), (health_bar_x, health_bar_y, health_progress, health_bar_height))
-
-# Attack class
-class Attack(pygame.sprite.Sprite):
-    def __init__(self, x, y, facing_right, is_player=True):
-        super().__init__()
-        self.image = pygame.Surface((30, 10), pygame.SRCALPHA)
-        if is_player:
-            self.image.fill((0, 255, 0, 200))
-        else:
-            self.image.fill((255, 0, 0, 200))
-        
-        self.rect = self.image.get_rect()
-        if facing_right:
-            self.rect.left = x
-        else:
-            self.rect.right = x
-        self.rect.centery = y
-        self.speed = 10
-        self.facing_right = facing_right
-        self.is_player = is_player
-        self.damage = 10 if is_player else 5
-        
-    def update(self):
-        if self.facing_right:
-            self.rect.x += self.speed
-        else:
-            self.rect.x -= self.speed
-        
-        if self.rect.right < 0 or self.rect.left > SCREEN_WIDTH:
-            self.kill()
+            return bar_rect
+        return None
 
 # Ground class
 class Ground(pygame.sprite.Sprite):
@@ -618,80 +1856,112 @@ class Ground(pygame.sprite.Sprite):
 
 # Enemy spawner system
 class EnemySpawner:
-    def __init__(self, max_enemies=5):
+    def __init__(self, game, max_enemies=5):
+        self.game = game
         self.max_enemies = max_enemies
         self.spawn_timer = 0
         self.spawn_interval = 400
         
     def update(self):
+        # Under heavy load the governor spaces out spawns and lowers the cap.
+        # Enemies parked in dormant chunks count, so walking away from them
+        # does not make room for more.
+        quality = self.game.quality
+        max_enemies = int(self.max_enemies * quality["max_enemies_scale"])
+        if self.max_enemies > 0:
+            max_enemies = max(1, max_enemies)
+        enemies = self.game.enemy_count() + self.game.world.dormant_enemies
         self.spawn_timer += 1
-        if self.spawn_timer >= self.spawn_interval and len(enemies) < self.max_enemies:
+        if self.spawn_timer >= self.spawn_interval * quality["spawn_interval_scale"] and enemies < max_enemies:
             self.spawn_timer = 0
             self.spawn_enemy()
     
     def spawn_enemy(self):
-        side = random.choice(["left", "right"])
+        # Just outside the camera's view, on a random side
+        rng = self.game.rng
+        camera = self.game.camera
+        side = rng.choice(["left", "right"])
         if side == "left":
-            x = -50
+            x = camera.x - 50
         else:
-            x = SCREEN_WIDTH + 50
+            x = camera.x + camera.width + 50
         
-        y = GROUND_HEIGHT - random.randint(150,151)
-        enemy = Enemy(x, y)
-        all_sprites.add(enemy)
-        enemies.add(enemy)
+        y = GROUND_HEIGHT - rng.randint(150,151)
+        self.game.add_enemy(x, y)
 
 # Ally system
 class AllySystem:
-    def __init__(self):
+    def __init__(self, game):
+        self.game = game
         self.allies = pygame.sprite.Group()
         self.convert_timer = 0
         
     def try_convert_enemy(self, enemy):
-        if random.random() < 0.3:
+        if self.game.rng.random() < 0.3:
             enemy.kill()
-            ally = Ally(enemy.rect.x, enemy.rect.y)
+            ally = self.game.ally_pool.acquire(enemy.rect.x, enemy.rect.y)
             self.allies.add(ally)
-            all_sprites.add(ally)
+            self.game.all_sprites.add(ally)
             return True
         return False
     
     def update(self):
         self.convert_timer += 1
 
+# Ally target filter. Horde recognises it and checks every enemy at once.
+def is_living(enemy):
+    return not enemy.is_dead
+
 # Ally class
 class Ally(pygame.sprite.Sprite):
-    def __init__(self, x, y):
+    def __init__(self, game, x=None, y=None):
         super().__init__()
-        self.idle_frames = load_animation_frames("assets/enemy/run", 2)
-        self.run_frames = load_animation_frames("assets/enemy/idle", 2)
-        self.attack_frames = load_animation_frames("assets/enemy/attack", 2)
+        self.game = game
+        self.idle_frames = frame_cache.get("assets/enemy/run", 2)
+        self.run_frames = frame_cache.get("assets/enemy/idle", 2)
+        self.attack_frames = frame_cache.get("assets/enemy/attack", 2)
+        self.speed = 3
+        self.animation_speed = 0.1
+        self.max_health = 50
         
+        # Pooled allies are reset when they are handed out
+        if x is not None:
+            self.reset(x, y)
+            
+    def reset(self, x, y):
         self.current_frames = self.idle_frames
         self.current_frame = 0
         self.image = self.current_frames[self.current_frame]
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
-        self.speed = 3
-        self.animation_speed = 0.1
         self.animation_time = 0
-        self.health = 50
-        self.max_health = 50
+        self.health = self.max_health
         self.attack_cooldown = 0
         self.target = None
         self.facing_right = True
+        self.game.ai.register("ally", self)
         
-    def update(self):
-        closest_enemy = None
-        min_distance = float('inf')
+    def kill(self):
+        was_alive = self.alive()
+        super().kill()
+        if was_alive:
+            self.target = None
+            self.game.previous_positions.pop(self, None)
+            self.game.ally_pool.release(self)
         
-        for enemy in enemies:
-            if not enemy.is_dead:
-                distance = abs(self.rect.x - enemy.rect.x)
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_enemy = enemy
+    def think(self):
+        self.target = self.game.enemy_index.nearest_x(self.rect.x, is_living)
+        self.target_seq = self.target.ai_seq if self.target is not None else None
+        
+    def update(self):
+        # Chase the target picked at the last think. One that has died (or
+        # been respawned from the pool) since is dropped, and the next think
+        # picks another.
+        closest_enemy = self.target
+        if closest_enemy is not None and (closest_enemy.is_dead or not closest_enemy.alive()
+                                          or closest_enemy.ai_seq != self.target_seq):
+            closest_enemy = self.target = None
         
         if closest_enemy:
             self.target = closest_enemy
@@ -705,15 +1975,13 @@ class Ally(pygame.sprite.Sprite):
             if abs(self.rect.x - closest_enemy.rect.x) < ATTACK_RANGE and self.attack_cooldown == 0:
                 self.attack()
         
-        self.animation_time += self.animation_speed
-        if self.animation_time >= 1:
-            self.current_frame = (self.current_frame + 1) % len(self.current_frames)
-            self.image = self.current_frames[self.current_frame]
-            
-            if not self.facing_right:
-                self.image = pygame.transform.flip(self.image, True, False)
-            
-            self.animation_time = 0
+        step = self.game.animation_step(self.rect.x)
+        if step == 1 or self.game.ticks % step == 0:
+            self.animation_time += self.animation_speed * step
+            if self.animation_time >= 1:
+                self.current_frame = (self.current_frame + 1) % len(self.current_frames)
+                self.image = self.current_frames.frame(self.current_frame, self.facing_right)
+                self.animation_time = 0
         
         if self.attack_cooldown > 0:
             self.attack_cooldown -= 1
@@ -725,117 +1993,485 @@ class Ally(pygame.sprite.Sprite):
         
         if self.target and abs(self.rect.x - self.target.rect.x) < ATTACK_RANGE:
             if self.target.take_damage(5):
-                if level_system.add_xp(5):
-                    player.attack_power += 1
+                self.game.player.attack_power += ALLY_LEVEL_POWER * self.game.level_system.add_xp(ALLY_KILL_XP)
 
-# Menu functions
-def draw_menu():
-    global menu_bg_x
-    # Draw scrolling background
-    menu_bg_x = (menu_bg_x - menu_scroll_speed) % menu_bg_width
-    screen.blit(menu_bg, (menu_bg_x - menu_bg_width, 0))
-    screen.blit(menu_bg, (menu_bg_x, 0))
-    
-    # Game title
-    title_text = title_font.render("Black Gun", True, YELLOW)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4))
-    screen.blit(title_text, title_rect)
-    
-    # Menu buttons
-    play_button.draw(screen)
-    options_button.draw(screen)
-    how_to_play_button.draw(screen)
-    shop_button.draw(screen)
-    quit_button.draw(screen)
-
-def draw_pause_menu():
-    # Semi-transparent background
-    s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 150))
-    screen.blit(s, (0, 0))
+# Enemy hordes stored as NumPy arrays (one entry per enemy) and advanced with
+# vectorized operations. Each tick matches Enemy.update for the same seed.
+class Horde:
+    IDLE = 0
+    ATTACKING = 1
+    DYING = 2
     
-    # Pause title
-    title_text = title_font.render("PAUSED", True, WHITE)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4))
-    screen.blit(title_text, title_rect)
+    FIELDS = [
+        ("ids", "int64"),
+        ("x", "int64"),
+        ("y", "int64"),
+        ("previous_x", "int64"),
+        ("speed", "int64"),
+        ("health", "float64"),
+        ("cooldown", "int64"),
+        ("death_timer", "int64"),
+        ("animation_time", "float64"),
+        ("frame", "int64"),
+        ("state", "int8"),
+        ("facing_right", "bool"),
+        ("image_state", "int8"),
+        ("image_frame", "int64"),
+        ("image_flipped", "bool"),
+        ("next_think", "int64"),
+        ("chase_dx", "int64"),
+        ("in_range", "bool")
+    ]
     
-    # Pause buttons
-    resume_button.draw(screen)
-    menu_button.draw(screen)
+    def __init__(self, game, capacity=64):
+        if np is None:
+            raise RuntimeError("The horde backend requires NumPy")
+        self.game = game
+        
+        # Same animations and stats as Enemy
+        self.animations = (
+            frame_cache.get("assets/enemy/run", 2),
+            frame_cache.get("assets/enemy/attack", 2),
+            frame_cache.get("assets/enemy/dead", 2)
+        )
+        self.frame_counts = np.array([len(frames) for frames in self.animations])
+        self.width, self.height = self.animations[0][0].get_size()
+        self.max_health = 30
+        self.attack_power = 5
+        self.attack_cooldown = 60
+        self.death_time = 42
+        self.animation_speed = 0.1
+        
+        self.capacity = capacity
+        self.count = 0
+        self.next_id = 0
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype))
+            
+    def __len__(self):
+        return self.count
+        
+    def __iter__(self):
+        return iter(self.members(slice(None)))
+        
+    def clear(self):
+        self.count = 0
+        
+    def grow(self):
+        self.capacity *= 2
+        for name, dtype in self.FIELDS:
+            array = np.zeros(self.capacity, dtype)
+            array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+            
+    def compact(self, keep):
+        # Drop removed enemies; order (and so id order) is preserved
+        kept = int(keep.sum())
+        for name, dtype in self.FIELDS:
+            array = getattr(self, name)
+            array[:kept] = array[:self.count][keep]
+        self.count = kept
+        
+    def spawn(self, x, y):
+        if self.count == self.capacity:
+            self.grow()
+        i = self.count
+        self.ids[i] = self.next_id
+        self.x[i] = x
+        self.y[i] = y
+        self.previous_x[i] = x
+        self.speed[i] = self.game.rng.randint(1, 3)
+        self.health[i] = self.max_health
+        self.cooldown[i] = 0
+        self.death_timer[i] = self.death_time
+        self.animation_time[i] = 0
+        self.frame[i] = 0
+        self.state[i] = self.IDLE
+        self.facing_right[i] = False
+        self.image_state[i] = self.IDLE
+        self.image_frame[i] = 0
+        self.image_flipped[i] = False
+        self.next_think[i] = self.game.ai.first_think("enemy")
+        self.chase_dx[i] = 0
+        self.in_range[i] = False
+        self.next_id += 1
+        self.count += 1
+        return HordeEnemy(self, self.ids[i])
+        
+    def park(self, mask):
+        # Take the masked enemies out, returning their rows for unpark()
+        rows = {name: getattr(self, name)[:self.count][mask].copy() for name, dtype in self.FIELDS}
+        self.compact(~mask)
+        return rows
+        
+    def unpark(self, blocks):
+        # Put parked rows back, keeping enemies in id order for index_of()
+        added = sum(len(rows["ids"]) for rows in blocks)
+        while self.count + added > self.capacity:
+            self.grow()
+        n = self.count + added
+        for name, dtype in self.FIELDS:
+            array = getattr(self, name)
+            array[self.count:n] = np.concatenate([rows[name] for rows in blocks])
+        order = np.argsort(self.ids[:n], kind="stable")
+        for name, dtype in self.FIELDS:
+            array = getattr(self, name)
+            array[:n] = array[:n][order]
+        self.count = n
+        
+    def index_of(self, enemy_id):
+        i = int(np.searchsorted(self.ids[:self.count], enemy_id))
+        if i < self.count and self.ids[i] == enemy_id:
+            return i
+        return None
+        
+    def remove(self, enemy_id):
+        i = self.index_of(enemy_id)
+        if i is None:
+            return False
+        keep = np.ones(self.count, bool)
+        keep[i] = False
+        self.compact(keep)
+        return True
+        
+    def update(self, player):
+        n = self.count
+        if n == 0:
+            return
+        x = self.x[:n]
+        state = self.state[:n]
+        cooldown = self.cooldown[:n]
+        frame = self.frame[:n]
+        animation_time = self.animation_time[:n]
+        self.previous_x[:n] = x
+        
+        alive = state != self.DYING
+        dying = ~alive
+        
+        # Death timers
+        self.death_timer[:n][dying] -= 1
+        expired = dying & (self.death_timer[:n] <= 0)
+        
+        # Chase the player, or attack when in range and off cooldown, as
+        # decided at each enemy's last think
+        dx = self.chase_dx[:n]
+        self.facing_right[:n][alive] = dx[alive] > 0
+        attacking = alive & self.in_range[:n] & (cooldown == 0)
+        moving = alive & ~attacking
+        x[moving] += dx[moving]
+        if attacking.any():
+            cooldown[attacking] = self.attack_cooldown
+            state[attacking] = self.ATTACKING
+            frame[attacking] = 0
+            player.health -= self.attack_power * int(attacking.sum())
+        
+        # Animation; dying enemies hold their last frame and are never flipped.
+        # Distant enemies may animate every few ticks under heavy load.
+        far_step = self.game.quality["far_animation_step"]
+        if far_step > 1:
+            far = np.abs(x - player.rect.x) > FAR_ANIMATION_DISTANCE
+            animate = ~far | (self.game.ticks % far_step == 0)
+            animation_time[animate] += np.where(far, self.animation_speed * far_step, self.animation_speed)[animate]
+            advance = animate & (animation_time >= 1)
+        else:
+            animation_time += self.animation_speed
+            advance = animation_time >= 1
+        if advance.any():
+            counts = self.frame_counts[state]
+            frame[advance] = (frame[advance] + 1) % counts[advance]
+            hold = advance & dying & (frame >= counts - 1)
+            frame[hold] = counts[hold] - 1
+            self.image_state[:n][advance] = state[advance]
+            self.image_frame[:n][advance] = frame[advance]
+            self.image_flipped[:n][advance] = alive[advance] & ~self.facing_right[:n][advance]
+            animation_time[advance] = 0
+        
+        cooldown[alive & (cooldown > 0)] -= 1
+        
+        if expired.any():
+            self.compact(~expired)
+            
+    def think(self, budget, interval):
+        # Same choice as AIScheduler.run: due living enemies, most overdue
+        # first, up to the budget. Returns (thinks, deferred).
+        n = self.count
+        ticks = self.game.ticks
+        due = np.flatnonzero((self.state[:n] != self.DYING) & (self.next_think[:n] <= ticks))
+        deferred = 0
+        budget = max(0, budget)
+        if len(due) > budget:
+            order = np.lexsort((self.ids[due], self.next_think[due]))
+            deferred = len(due) - budget
+            due = due[order[:budget]]
+        if len(due):
+            x = self.x[due]
+            speed = self.speed[due]
+            player_x = self.game.player.rect.x
+            self.chase_dx[due] = np.where(x < player_x, speed, -speed)
+            self.in_range[due] = np.abs(x - player_x) < ATTACK_RANGE
+            self.next_think[due] = ticks + interval
+        return len(due), deferred
+        
+    def take_damage(self, i, damage):
+        self.health[i] -= damage
+        if self.health[i] <= 0 and self.state[i] != self.DYING:
+            self.game.money_system.enemy_killed()
+            audio.play("enemy_death")
+            self.state[i] = self.DYING
+            self.frame[i] = 0
+            return True
+        return False
+        
+    def members(self, indices):
+        return [HordeEnemy(self, enemy_id) for enemy_id in self.ids[:self.count][indices]]
+        
+    def members_by_x(self, mask):
+        # Left to right, like AxisIndex results
+        indices = np.nonzero(mask)[0]
+        order = np.argsort(self.x[:self.count][indices], kind="stable")
+        return self.members(indices[order])
+        
+    def in_x_range(self, low, high):
+        x = self.x[:self.count]
+        return self.members_by_x((x > low) & (x < high))
+        
+    def nearest_x(self, x, predicate=None):
+        # Ties go to the enemy on the left, as in AxisIndex
+        positions = self.x[:self.count]
+        distances = (np.abs(positions - x) * 2 + (positions > x)).astype(float)
+        if predicate is is_living:
+            distances[self.state[:self.count] == self.DYING] = float('inf')
+            predicate = None
+        while len(distances):
+            i = int(np.argmin(distances))
+            if distances[i] == float('inf'):
+                break
+            enemy = HordeEnemy(self, self.ids[i])
+            if predicate is None or predicate(enemy):
+                return enemy
+            distances[i] = float('inf')
+        return None
+        
+    def colliding(self, rect):
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        hit = (x < rect.right) & (x + self.width > rect.left) & (y < rect.bottom) & (y + self.height > rect.top)
+        return self.members_by_x(hit)
+        
+    def on_screen(self, alpha, view_x, view_width):
+        # Indices of the enemies in view, and their interpolated screen x
+        n = self.count
+        x = self.x[:n]
+        if alpha < 1.0:
+            x = np.rint(self.previous_x[:n] + (x - self.previous_x[:n]) * alpha).astype(int)
+        visible = np.flatnonzero((x < view_x + view_width) & (x + self.width > view_x))
+        return visible, x[visible] - view_x
+        
+    def blits(self, alpha=1.0, view_x=0, view_width=SCREEN_WIDTH):
+        visible, x = self.on_screen(alpha, view_x, view_width)
+        animations = self.animations
+        return [(animations[s].frame(f, not flipped), (px, py))
+                for s, f, flipped, px, py in zip(self.image_state[visible].tolist(), self.image_frame[visible].tolist(),
+                                                 self.image_flipped[visible].tolist(), x.tolist(), self.y[visible].tolist())]
+        
+    def draw_health(self, surface, alpha=1.0, view_x=0, view_width=SCREEN_WIDTH):
+        visible, screen_x = self.on_screen(alpha, view_x, view_width)
+        health_bar_width = 50
+        health_bar_height = 5
+        rects = []
+        for x, y, health, state in zip(screen_x.tolist(), self.y[visible].tolist(), self.health[visible].tolist(),
+                                       self.state[visible].tolist()):
+            if state == self.DYING:
+                continue
+            y -= 10
+            rects.append(pygame.draw.rect(surface, (255, 0, 0), (x, y, health_bar_width, health_bar_height)))
+            health_progress = (health / self.max_health) * health_bar_width
+            pygame.draw.rect(surface, (0, 255, 0), (x, y, health_progress, health_bar_height))
+        return rects
 
-def draw_options_menu():
-    screen.blit(menu_bg, (0, 0))
-    
-    title_text = title_font.render("OPTIONS", True, WHITE)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4))
-    screen.blit(title_text, title_rect)
-    
-    back_button.draw(screen)
-    
-    volume_text = menu_font.render("Volume: ", True, WHITE)
-    screen.blit(volume_text, (SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2))
+# Handle to one horde enemy, usable wherever an Enemy sprite is expected
+class HordeEnemy:
+    def __init__(self, horde, enemy_id):
+        self.horde = horde
+        self.enemy_id = int(enemy_id)
+        self.last_rect = None
+        
+    # Identifies this enemy's life, like Enemy.ai_seq for pooled sprites
+    @property
+    def ai_seq(self):
+        return self.enemy_id
+        
+    def __eq__(self, other):
+        return isinstance(other, HordeEnemy) and other.enemy_id == self.enemy_id
+        
+    def __hash__(self):
+        return self.enemy_id
+        
+    @property
+    def is_dead(self):
+        i = self.horde.index_of(self.enemy_id)
+        return i is None or self.horde.state[i] == Horde.DYING
+        
+    @property
+    def rect(self):
+        horde = self.horde
+        i = horde.index_of(self.enemy_id)
+        if i is None:
+            return self.last_rect or pygame.Rect(0, 0, 0, 0)
+        return pygame.Rect(int(horde.x[i]), int(horde.y[i]), horde.width, horde.height)
+        
+    def alive(self):
+        return self.horde.index_of(self.enemy_id) is not None
+        
+    def take_damage(self, damage):
+        i = self.horde.index_of(self.enemy_id)
+        if i is None:
+            return False
+        return self.horde.take_damage(i, damage)
+        
+    def kill(self):
+        # Keep the final position for callers that replace the enemy, e.g. ally conversion
+        self.last_rect = self.rect
+        self.horde.remove(self.enemy_id)
 
-def draw_how_to_play():
-    screen.blit(menu_bg, (0, 0))
+# Menu screen backdrops
+def draw_scrolling_backdrop(surface, game):
+    global menu_bg_x
+    menu_bg_x = (menu_bg_x - menu_scroll_speed) % menu_bg_width
+    surface.blit(menu_bg, (menu_bg_x - menu_bg_width, 0))
+    surface.blit(menu_bg, (menu_bg_x, 0))
+
+def draw_still_backdrop(surface, game):
+    surface.blit(menu_bg, (0, 0))
+
+# Menu screens by game state, built once the fonts exist
+menu_screens = {}
+
+def build_menu_screens():
+    # Game drawn behind a semi-transparent overlay
+    pause_overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    pause_overlay.fill((0, 0, 0, 150))
     
-    title_text = title_font.render("HOW TO PLAY", True, WHITE)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//6))
-    screen.blit(title_text, title_rect)
+    def draw_paused_backdrop(surface, game):
+        game.draw(surface)
+        surface.blit(pause_overlay, (0, 0))
     
     instructions = [
         "Movement: A/D or Left/Right Arrow Keys"
     ]
+    how_to_play_labels = [Label(line, menu_font, WHITE, topleft=(SCREEN_WIDTH//2 - 250, SCREEN_HEIGHT//3 + i * 40))
+                          for i, line in enumerate(instructions)]
     
-    for i, line in enumerate(instructions):
-        text = menu_font.render(line, True, WHITE)
-        screen.blit(text, (SCREEN_WIDTH//2 - 250, SCREEN_HEIGHT//3 + i * 40))
+    stats_labels = [Label("", menu_font, WHITE, center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + i * 40)) for i in range(3)]
     
-    back_button.draw(screen)
-
-def draw_game_over():
-    screen.blit(menu_bg, (0, 0))
-    
-    title_text = title_font.render("GAME OVER", True, RED)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4))
-    screen.blit(title_text, title_rect)
+    def show_game_stats(game):
+        stats_text = [
+            f"Level Reached: {game.level_system.level}",
+            f"Total Kills: {game.level_system.total_kills}",
+            f"Total XP: {game.level_system.xp}"
+        ]
+        for label, text in zip(stats_labels, stats_text):
+            label.set_text(text)
     
-    stats_text = [
-        f"Level Reached: {level_system.level}",
-        f"Total Kills: {level_system.total_kills}",
-        f"Total XP: {level_system.xp}"
-    ]
+    menu_screens.clear()
+    menu_screens[MENU] = MenuScreen(draw_scrolling_backdrop, [
+        Label("Black Gun", title_font, YELLOW, center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4)),
+        continue_button, play_button, options_button, how_to_play_button, shop_button, quit_button
+    ], animated=True)
+    menu_screens[PAUSED] = MenuScreen(draw_paused_backdrop, [
+        Label("PAUSED", title_font, WHITE, center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4)),
+        resume_button, menu_button
+    ])
+    menu_screens[OPTIONS] = MenuScreen(draw_still_backdrop, [
+        Label("OPTIONS", title_font, WHITE, center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4)),
+        Label("Volume: ", menu_font, WHITE, topleft=(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2)),
+        back_button
+    ])
+    menu_screens[HOW_TO_PLAY] = MenuScreen(draw_still_backdrop, [
+        Label("HOW TO PLAY", title_font, WHITE, center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//6))
+    ] + how_to_play_labels + [back_button])
+    menu_screens[GAME_OVER] = MenuScreen(draw_still_backdrop, [
+        Label("GAME OVER", title_font, RED, center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4))
+    ] + stats_labels + [menu_button, quit_button], on_enter=show_game_stats)
+    return menu_screens
+
+def draw_loading_screen(progress):
+    screen.fill(BLACK)
+    title_text = text_cache.render(title_font, "Black Gun", YELLOW)
+    screen.blit(title_text, title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//3)))
     
-    for i, line in enumerate(stats_text):
-        text = menu_font.render(line, True, WHITE)
-        text_rect = text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + i * 40))
-        screen.blit(text, text_rect)
+    loading_text = text_cache.render(menu_font, "Loading...", WHITE)
+    screen.blit(loading_text, loading_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2)))
     
-    menu_button.draw(screen)
-    quit_button.draw(screen)
-
-# Create sprite groups
-all_sprites = pygame.sprite.Group()
-ground_group = pygame.sprite.Group()
-enemies = pygame.sprite.Group()
-attacks = pygame.sprite.Group()
-
-# Create ground
-ground = Ground()
-ground_group.add(ground)
-all_sprites.add(ground)
-
-# Create player
-player = Player(50, GROUND_HEIGHT - 100)
-all_sprites.add(player)
-
-# Initialize game systems
-money_system = MoneySystem()
-level_system = LevelSystem()
-enemy_spawner = EnemySpawner(max_enemies=4)
-ally_system = AllySystem()
-shop_system = ShopSystem()
+    bar_width = 400
+    bar_x = SCREEN_WIDTH//2 - bar_width//2
+    bar_y = SCREEN_HEIGHT//2 + 40
+    pygame.draw.rect(screen, GRAY, (bar_x, bar_y, bar_width, 20))
+    pygame.draw.rect(screen, YELLOW, (bar_x, bar_y, int(bar_width * progress), 20))
+
+# Dirty-rectangle renderer for the PLAYING state
+USE_DIRTY_RECTS = True
+
+class DirtyRenderer:
+    def __init__(self):
+        self.scroll_x = None  # Background offset of the last frame, before wrapping
+        self.previous_rects = []
+        self.full_redraw = True
+        
+    def invalidate(self):
+        self.full_redraw = True
+        
+    def scroll_to(self, surface, view_x):
+        # The background moves at BACKGROUND_PARALLAX of the camera's speed, so
+        # a small camera move may leave it in place. When it does move, the
+        # screen is shifted to match and only the exposed strip and last
+        # frame's rects (shifted with it) need their background back. Returns
+        # the rects to restore and whether the screen scrolled.
+        scroll_x = int(view_x * BACKGROUND_PARALLAX)
+        previous = self.scroll_x
+        self.scroll_x = scroll_x
+        if previous is None:
+            self.full_redraw = True
+        if self.full_redraw or scroll_x == previous:
+            return self.previous_rects, False
+        dx = previous - scroll_x
+        width, height = surface.get_size()
+        if abs(dx) >= width:
+            self.full_redraw = True
+            return self.previous_rects, False
+        surface.scroll(dx, 0)
+        exposed = pygame.Rect(0, 0, dx, height) if dx > 0 else pygame.Rect(width + dx, 0, -dx, height)
+        return [rect.move(dx, 0) for rect in self.previous_rects] + [exposed], True
+        
+    def draw(self, surface, blits, draw_overlay, view_x=0):
+        # Restore the background only where something was drawn last frame
+        with profiler.section("background"):
+            restore_rects, scrolled = self.scroll_to(surface, view_x)
+            if self.full_redraw:
+                draw_world_background(surface, view_x)
+            else:
+                for rect in restore_rects:
+                    surface.set_clip(rect)
+                    draw_world_background(surface, view_x)
+                surface.set_clip(None)
+        
+        with profiler.section("sprites"):
+            drawn_rects = [surface.blit(image, pos) for image, pos in blits]
+        with profiler.section("hud"):
+            drawn_rects.extend(rect for rect in draw_overlay(surface) if rect)
+        
+        with profiler.section("present"):
+            # A scrolled screen changed everywhere
+            if self.full_redraw or scrolled:
+                pygame.display.flip()
+                self.full_redraw = False
+            else:
+                pygame.display.update(self.previous_rects + drawn_rects)
+        self.previous_rects = drawn_rects
 
 # Menu buttons
+continue_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 - 120, 200, 50, "Continue")
 play_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 - 60, 200, 50, "Play")
 options_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2, 200, 50, "Options")
 how_to_play_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 + 60, 200, 50, "How to Play")
@@ -849,39 +2485,163 @@ menu_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 + 30, 200, 50, "Mai
 # Back button
 back_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT - 100, 200, 50, "Back")
 
-# Save/Load System
+# Save/Load System. Saves are versioned JSON, written on a background thread
+# to a temporary file that replaces the save only once it is fully on disk.
 class SaveSystem:
-    def __init__(self):
-        self.save_file = "game_save.dat"
+    def __init__(self, save_file=SAVE_FILE, autosave_interval=AUTOSAVE_INTERVAL):
+        self.save_file = save_file
+        self.autosave_interval = autosave_interval
+        self.last_autosave = None
+        self.last_saved = None
+        self.pending = None
+        self.worker = None
+        self.lock = threading.Lock()
+        self.save_exists = os.path.exists(save_file)
+        
+    @staticmethod
+    def snapshot(game):
+        player = game.player
+        level_system = game.level_system
+        return {
+            'version': SAVE_VERSION,
+            'player': {
+                'health': player.health,
+                'x': player.rect.x,
+                'y': player.rect.y,
+                'attack_power': player.attack_power,
+                'weapon': player.current_weapon.name if player.current_weapon else None
+            },
+            'money': game.money_system.money,
+            'level': {
+                'level': level_system.level,
+                'xp': level_system.xp,
+                'xp_to_next': level_system.xp_to_next_level,
+                'kills': level_system.total_kills
+            },
+            'weapons': {w.name: w.owned for w in game.shop_system.weapons},
+            'world_width': game.world.width
+        }
+        
+    def save_game(self, game):
+        # Dead players are not saved, and unchanged state is not written again
+        if game.player.health <= 0:
+            return False
+        data = self.snapshot(game)
+        if data == self.last_saved:
+            return False
+        self.last_saved = data
+        with self.lock:
+            self.pending = data
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.write_pending, daemon=True)
+                self.worker.start()
+        return True
+        
+    def autosave(self, game, now):
+        if self.last_autosave is None:
+            self.last_autosave = now
+        elif now - self.last_autosave >= self.autosave_interval:
+            self.last_autosave = now
+            return self.save_game(game)
+        return False
         
-    def save_game(self, player, money_system, level_system):
+    def write_pending(self):
+        # Runs on the worker thread until no newer snapshot is waiting
+        while True:
+            with self.lock:
+                data = self.pending
+                self.pending = None
+                if data is None:
+                    self.worker = None
+                    return
+            self.write_file(data)
+            
+    def write_file(self, data):
+        temp_file = self.save_file + ".tmp"
         try:
-            with open(self.save_file, 'r') as f:
-                pickle.dump({
-                    'player_health': player.health,
-                    'player_x': player.rect.x,
-                    'player_y': player.rect.y,
-                    'money': money_system.money,
-                    'level': level_system.level,
-                    'xp': level_system.xp,
-                    'xp_to_next': level_system.xp_to_next_level,
-                    'kills': level_system.total_kills,
-                    'weapons': [(w.name, w.owned) for w in shop_system.weapons],
-                    'attack_power': player.attack_power
-                }, f)
-            return True
-        except:
-            return False
+            with open(temp_file, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.save_file)
+            self.save_exists = True
+        except Exception as e:
+            print(f"Error saving game: {e}")
+            self.last_saved = None
+            
+    def flush(self):
+        # Wait for any save in progress, e.g. before quitting
+        worker = self.worker
+        if worker is not None:
+            worker.join()
             
     def load_game(self):
         try:
-            with open(self.save_file, 'rb') as f:
-                data = pickle.load(f)
-                return data
+            with open(self.save_file, 'r') as f:
+                data = json.load(f)
         except:
             return None
-
-save_system = SaveSystem()
+        if not self.is_valid(data):
+            return None
+        return data
+        
+    # Fields of a save and their types; a save that does not match is
+    # treated as missing rather than restored
+    SCHEMA = {
+        'version': int,
+        'player': {'health': int, 'x': int, 'y': int, 'attack_power': int, 'weapon': (str, type(None))},
+        'money': int,
+        'level': {'level': int, 'xp': int, 'xp_to_next': int, 'kills': int},
+        'weapons': dict
+    }
+    
+    @classmethod
+    def matches(cls, value, schema):
+        if isinstance(schema, dict):
+            return isinstance(value, dict) and all(
+                key in value and cls.matches(value[key], field) for key, field in schema.items())
+        return isinstance(value, schema) and not isinstance(value, bool)
+        
+    @classmethod
+    def is_valid(cls, data):
+        if not cls.matches(data, cls.SCHEMA) or data['version'] != SAVE_VERSION:
+            return False
+        if not 1 <= data['level']['level'] <= MAX_LEVEL or data['level']['xp'] < 0:
+            return False
+        if not all(isinstance(name, str) and cls.matches(owned, int) for name, owned in data['weapons'].items()):
+            return False
+        # Saves from before the scrolling world have no width
+        width = data.get('world_width', WORLD_WIDTH)
+        return cls.matches(width, int) and width >= SCREEN_WIDTH
+        
+    def restore(self, game, data):
+        # Saves from before the scrolling world have no width and fit any world
+        game.reset()
+        if 'world_width' in data:
+            game.resize_world(data['world_width'])
+        player = game.player
+        level_system = game.level_system
+        
+        player.health = data['player']['health']
+        player.rect.x = data['player']['x']
+        player.rect.y = data['player']['y']
+        game.money_system.money = data['money']
+        level_system.level = data['level']['level']
+        level_system.xp = data['level']['xp']
+        level_system.xp_to_next_level = XP_TABLE[level_system.level]
+        level_system.total_kills = data['level']['kills']
+        
+        player.weapons = []
+        player.current_weapon = None
+        for weapon in game.shop_system.weapons:
+            weapon.owned = data['weapons'].get(weapon.name, 0)
+            if weapon.name == data['player']['weapon']:
+                player.add_weapon(weapon)
+        player.attack_power = data['player']['attack_power']
+        game.follow_player(snap=True)
+        
+        # The restored state is what is on disk
+        self.last_saved = self.snapshot(game)
 
 # Enhanced Weapon System
 class EnhancedWeapon(Weapon):
@@ -893,75 +2653,36 @@ class EnhancedWeapon(Weapon):
         
     def draw_attack(self, surface, x, y, facing_right):
         if self.attacking and self.attack_frames:
-            frame = self.attack_frames[self.current_attack_frame]
-            if not facing_right:
-                frame = pygame.transform.flip(frame, True, False)
+            frame = self.attack_frames.frame(self.current_attack_frame, facing_right)
             surface.blit(frame, (x, y))
             self.current_attack_frame = (self.current_attack_frame + 1) % len(self.attack_frames)
             if self.current_attack_frame == 0:
                 self.attacking = False
 
 # Enhanced Shop System
+# Weapons in the shop: name, damage, price, icon, attack animation
+SHOP_WEAPONS = [
+    ("Wooden Gun", 10, 50, "assets/menu/HUD/WEAPON ICONS/Pistol HUD.png",
+     "C:/Users/dani/Desktop/Game Wars/assets/PNG/Explosion/0.png"),
+    ("Pistol", 20, 100, "assets/menu/HUD/WEAPON ICONS/RPG HUD.png", "assets/PNG/Nuclear_explosion/0.png"),
+    ("Shotgun", 30, 200, "assets/menu/HUD/WEAPON ICONS/MG HUD.png", "assets/PNG/Nuclear_explosion/0.png"),
+    ("Rifle", 40, 350, "assets/menu/HUD/WEAPON ICONS/Flamethrower HUD.png", "assets/PNG/Nuclear_explosion/0.png")
+]
+
 class EnhancedShopSystem(ShopSystem):
     def __init__(self):
         super().__init__()
         # Load weapon attack animations
         self.weapons = [
-            EnhancedWeapon("Wooden Gun", 10, 50, 
-                          "assets/menu/HUD/WEAPON ICONS/Pistol HUD.png",
-                          load_animation_frames("C:/Users/dani/Desktop/Game Wars/assets/PNG/Explosion/0.png", 2)),
-            EnhancedWeapon("Pistol", 20, 100, 
-                          "assets/menu/HUD/WEAPON ICONS/RPG HUD.png",
-                          load_animation_frames("assets/PNG/Nuclear_explosion/0.png", 2)),
-            EnhancedWeapon("Shotgun", 30, 200, 
-                          "assets/menu/HUD/WEAPON ICONS/MG HUD.png",
-                          load_animation_frames("assets/PNG/Nuclear_explosion/0.png", 2)),
-            EnhancedWeapon("Rifle", 40, 350, 
-                          "assets/menu/HUD/WEAPON ICONS/Flamethrower HUD.png",
-                          load_animation_frames("assets/PNG/Nuclear_explosion/0.png", 2))
+            EnhancedWeapon(name, damage, price, icon, frame_cache.get(animation, 2))
+            for name, damage, price, icon, animation in SHOP_WEAPONS
         ]
-        
-    def draw(self, surface, money_system):
-        # Semi-transparent background
-        s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        s.fill((0, 0, 0, 200))
-        surface.blit(s, (0, 0))
-        
-        # Shop title
-        title = title_font.render("WEAPON SHOP", True, YELLOW)
-        surface.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 50))
-        
-        # Current money
-        money_text = menu_font.render(f"Your Money: ${money_system.money}", True, WHITE)
-        surface.blit(money_text, (SCREEN_WIDTH//2 - money_text.get_width()//2, 120))
-        
-        # Weapons list
-        for i, weapon in enumerate(self.weapons):
-            y_pos = 180 + i * 120
-            weapon.draw(surface, SCREEN_WIDTH//2 - 150, y_pos)
-            
-            # Buy button
-            buy_btn = Button(SCREEN_WIDTH//2 + 100, y_pos + 20, 80, 30, "Buy", GREEN)
-            buy_btn.draw(surface)
-            
-            # Sell button
-            sell_btn = Button(SCREEN_WIDTH//2 + 100, y_pos + 60, 80, 30, "Sell", RED)
-            sell_btn.draw(surface)
-        
-        # Exit button
-        exit_btn = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT - 80, 200, 50, "Exit Shop")
-        exit_btn.draw(surface)
-        
-        return exit_btn
 
 # Enhanced Player Class
 class EnhancedPlayer(Player):
     def ranged_attack(self):
         if self.attack_cooldown == 0 and not self.is_attacking and self.current_weapon:
-            try:
-                attack_sound.play()
-            except:
-                pass
+            audio.play("attack")
             self.attack_cooldown = 30
             self.is_attacking = True
             self.current_frame = 0
@@ -969,7 +2690,7 @@ class EnhancedPlayer(Player):
             
             # Create projectile based on weapon type
             if isinstance(self.current_weapon, EnhancedWeapon):
-                attack = EnhancedAttack(
+                self.game.projectiles.fire(
                     self.rect.right if self.facing_right else self.rect.left,
                     self.rect.centery,
                     self.facing_right,
@@ -978,242 +2699,1348 @@ class EnhancedPlayer(Player):
                     size=(30, 10),
                     color=YELLOW
                 )
-                all_sprites.add(attack)
-                attacks.add(attack)
                 return True
         return False
 
-# Enhanced Attack Class
-class EnhancedAttack(Attack):
-    def __init__(self, x, y, facing_right, damage=10, speed=10, size=(30, 10), color=GREEN):
-        super().__init__(x, y, facing_right)
-        self.image = pygame.Surface(size, pygame.SRCALPHA)
-        self.image.fill(color)
-        self.rect = self.image.get_rect()
-        if facing_right:
-            self.rect.left = x
-        else:
-            self.rect.right = x
-        self.rect.centery = y
-        self.speed = speed
-        self.facing_right = facing_right
-        self.damage = damage
+# Shared projectile images, keyed by (size, color). Every shot of a kind looks
+# the same, so the surface is built once and blitted many times.
+projectile_images = {}
 
-# Initialize enhanced systems
-shop_system = EnhancedShopSystem()
-player = EnhancedPlayer(50, GROUND_HEIGHT - 100)
-all_sprites.add(player)
+def projectile_image(size, color):
+    key = (tuple(size), tuple(color))
+    image = projectile_images.get(key)
+    if image is None:
+        image = pygame.Surface(size, pygame.SRCALPHA)
+        image.fill(color)
+        projectile_images[key] = image
+    return image
 
-# Main game loop
-running = True
-while running:
-    mouse_pos = pygame.mouse.get_pos()
+# Projectiles for both the player and enemies, kept in fixed-capacity parallel
+# arrays. Shots are advanced and culled in batch; NumPy is used when installed.
+class ProjectileSystem:
+    FIELDS = ["x", "y", "previous_x", "velocity", "width", "height", "damage", "kind", "from_player"]
     
-    # Update menu background position
-    if game_state == MENU:
-        menu_bg_x -= menu_scroll_speed
-        if menu_bg_x <= -menu_bg_width:
-            menu_bg_x = 0
+    def __init__(self, capacity=PROJECTILE_CAPACITY):
+        self.capacity = capacity
+        self.count = 0
+        self.dropped = 0
+        self.kinds = []
+        self.kind_ids = {}
+        self.discarded = set()
+        for name in self.FIELDS:
+            if np is not None:
+                setattr(self, name, np.zeros(capacity, "int64"))
+            else:
+                setattr(self, name, [0] * capacity)
+                
+    def __len__(self):
+        return self.count
+        
+    def clear(self):
+        self.count = 0
+        self.discarded.clear()
+        
+    def kind_for(self, size, color):
+        key = (tuple(size), tuple(color))
+        kind = self.kind_ids.get(key)
+        if kind is None:
+            kind = len(self.kinds)
+            self.kinds.append(projectile_image(size, color))
+            self.kind_ids[key] = kind
+        return kind
+        
+    def fire(self, x, y, facing_right, from_player=True, damage=None, speed=10, size=(30, 10), color=None):
+        if self.count == self.capacity:
+            self.dropped += 1
+            return False
+        if damage is None:
+            damage = 10 if from_player else 5
+        if color is None:
+            color = (0, 255, 0, 200) if from_player else (255, 0, 0, 200)
+        width, height = size
+        
+        # The shot starts at x on its leading side
+        i = self.count
+        self.x[i] = x if facing_right else x - width
+        self.y[i] = y - height // 2
+        self.previous_x[i] = self.x[i]
+        self.velocity[i] = speed if facing_right else -speed
+        self.width[i] = width
+        self.height[i] = height
+        self.damage[i] = damage
+        self.kind[i] = self.kind_for(size, color)
+        self.from_player[i] = 1 if from_player else 0
+        self.count += 1
+        return True
+        
+    def compact(self, keep):
+        kept = 0
+        if np is not None:
+            keep = np.asarray(keep, bool)
+            kept = int(keep.sum())
+            for name in self.FIELDS:
+                array = getattr(self, name)
+                array[:kept] = array[:self.count][keep]
+        else:
+            indices = [i for i in range(self.count) if keep[i]]
+            kept = len(indices)
+            for name in self.FIELDS:
+                array = getattr(self, name)
+                array[:kept] = [array[i] for i in indices]
+        self.count = kept
+        
+    def update(self, left=0, right=SCREEN_WIDTH):
+        # Shots leaving the world x range left..right (the camera's view) are removed
+        n = self.count
+        if n == 0:
+            return
+        if np is not None:
+            x = self.x[:n]
+            self.previous_x[:n] = x
+            x += self.velocity[:n]
+            keep = (x + self.width[:n] >= left) & (x <= right)
+            if not keep.all():
+                self.compact(keep)
+        else:
+            x = self.x
+            self.previous_x[:n] = x[:n]
+            keep = []
+            for i in range(n):
+                x[i] += self.velocity[i]
+                keep.append(x[i] + self.width[i] >= left and x[i] <= right)
+            if not all(keep):
+                self.compact(keep)
+                
+    def rect(self, i):
+        return pygame.Rect(int(self.x[i]), int(self.y[i]), int(self.width[i]), int(self.height[i]))
+        
+    def player_shots(self):
+        # (index, rect, damage) for each player shot, oldest first
+        if np is None:
+            return [(i, self.rect(i), self.damage[i]) for i in range(self.count) if self.from_player[i]]
+        indices = np.nonzero(self.from_player[:self.count])[0]
+        columns = [indices] + [getattr(self, name)[indices] for name in ("x", "y", "width", "height", "damage")]
+        return [(i, pygame.Rect(x, y, width, height), damage)
+                for i, x, y, width, height, damage in zip(*[column.tolist() for column in columns])]
+        
+    def discard(self, i):
+        self.discarded.add(i)
+        
+    def hit(self, rect, from_player=False):
+        # Discard every shot of one side overlapping rect and return their total damage
+        n = self.count
+        if n == 0:
+            return 0
+        if np is not None:
+            x = self.x[:n]
+            y = self.y[:n]
+            hits = ((self.from_player[:n] == (1 if from_player else 0)) &
+                    (x < rect.right) & (x + self.width[:n] > rect.left) &
+                    (y < rect.bottom) & (y + self.height[:n] > rect.top))
+            indices = np.nonzero(hits)[0].tolist()
+        else:
+            indices = [i for i in range(n) if bool(self.from_player[i]) == from_player and rect.colliderect(self.rect(i))]
+        self.discarded.update(indices)
+        return sum(int(self.damage[i]) for i in indices)
+        
+    def flush(self):
+        # Remove discarded shots
+        if self.discarded:
+            if np is not None:
+                keep = np.ones(self.count, bool)
+                keep[list(self.discarded)] = False
+            else:
+                keep = [i not in self.discarded for i in range(self.count)]
+            self.compact(keep)
+            self.discarded.clear()
+            
+    def blits(self, alpha=1.0, view_x=0, view_width=SCREEN_WIDTH):
+        n = self.count
+        kinds = self.kinds
+        x, y, kind, width = self.x[:n], self.y[:n], self.kind[:n], self.width[:n]
+        right = view_x + view_width
+        if np is not None:
+            if alpha < 1.0:
+                previous = self.previous_x[:n]
+                x = np.rint(previous + (x - previous) * alpha).astype("int64")
+            visible = (x < right) & (x + width > view_x)
+            return [(kinds[k], (px - view_x, py))
+                    for k, px, py in zip(kind[visible].tolist(), x[visible].tolist(), y[visible].tolist())]
+        if alpha < 1.0:
+            x = [round(px + (cx - px) * alpha) for px, cx in zip(self.previous_x[:n], x)]
+        return [(kinds[k], (px - view_x, py)) for k, px, py, w in zip(kind, x, y, width) if px < right and px + w > view_x]
+
+# Accumulator for running the simulation at a fixed tick rate, independent
+# of how fast frames are rendered
+class FixedTimestep:
+    def __init__(self, tick_rate=TICK_RATE, max_catchup_ticks=MAX_CATCHUP_TICKS):
+        self.tick_time = 1.0 / tick_rate
+        self.max_catchup_ticks = max_catchup_ticks
+        self.accumulator = 0.0
+        self.last_time = None
+        self.dropped_ticks = 0
+        
+    def reset(self):
+        self.accumulator = 0.0
+        self.last_time = None
+        
+    def advance(self, now):
+        # Number of ticks due since the last call
+        if self.last_time is not None:
+            self.accumulator += now - self.last_time
+        self.last_time = now
+        
+        ticks = int(self.accumulator / self.tick_time)
+        if ticks > self.max_catchup_ticks:
+            # Drop the backlog rather than spiral further behind after a slow frame
+            self.dropped_ticks += ticks - self.max_catchup_ticks
+            self.accumulator -= (ticks - self.max_catchup_ticks) * self.tick_time
+            ticks = self.max_catchup_ticks
+        self.accumulator -= ticks * self.tick_time
+        return ticks
+        
+    def alpha(self):
+        # How far the current frame is between the last tick and the next one
+        return self.accumulator / self.tick_time
+
+# Per-section frame timers, toggled at runtime. While disabled, section()
+# returns a shared no-op context, so instrumented code costs one method call.
+PROFILER_HISTORY = 3600  # Frames kept for the overlay and CSV export
+PROFILER_TRACE_EVENTS = 200000  # Timed sections kept for the Chrome trace
+PROFILER_CSV_PATH = "profile_frames.csv"
+PROFILER_TRACE_PATH = "profile_trace.json"
+
+class NullSection:
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *exc_info):
+        return False
+
+class ProfilerSection:
+    __slots__ = ("profiler", "name", "start")
     
-    # Handle music based on game state
-    if game_state == MENU and not menu_music_playing:
-        try:
-            mixer.music.stop()
-            mixer.music.load("assets/sounds/menu/button/click.mp3")
-            mixer.music.play(-1)
-            menu_music_playing = True
-            game_music_playing = False
-        except:
-            menu_music_playing = False
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+        
+    def __enter__(self):
+        self.profiler.depth += 1
+        self.start = time.perf_counter()
+        return self
+        
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        profiler = self.profiler
+        profiler.depth -= 1
+        profiler.record(self.name, self.start, end, profiler.depth)
+        return False
 
-    elif game_state == PLAYING and not game_music_playing:
-        try:
-            mixer.music.stop()
-            mixer.music.load("assets/sounds/game_music.mp3")
-            mixer.music.play(-1)
-            game_music_playing = True
-            menu_music_playing = False
-        except:
-            game_music_playing = False
+class FrameProfiler:
+    COLORS = [(80, 160, 255), (255, 170, 60), (120, 220, 120), (230, 90, 90),
+              (200, 120, 230), (240, 230, 90), (90, 220, 220), (180, 180, 180)]
     
-    # Event handling
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+    def __init__(self, history=PROFILER_HISTORY, max_events=PROFILER_TRACE_EVENTS):
+        self.enabled = False
+        self.show_overlay = False
+        self.null_section = NullSection()
+        self.frames = deque(maxlen=history)
+        self.events = deque(maxlen=max_events)
+        self.section_depths = {}
+        self.current = {}
+        self.depth = 0
+        self.frame_start = None
+        self.frame_number = 0
+        self.origin = time.perf_counter()
+        self.overlay = None
+        self.counters = {}
+        
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.show_overlay = self.enabled
+        self.frame_start = None
+        
+    def section(self, name):
+        if not self.enabled:
+            return self.null_section
+        return ProfilerSection(self, name)
+        
+    # mark()/measure() time a block without re-indenting it under a with
+    def mark(self):
+        if not self.enabled:
+            return None
+        return time.perf_counter()
         
-        # Menu state
-        if game_state == MENU:
-            play_button.check_hover(mouse_pos)
-            options_button.check_hover(mouse_pos)
-            how_to_play_button.check_hover(mouse_pos)
-            shop_button.check_hover(mouse_pos)
-            quit_button.check_hover(mouse_pos)
+    def measure(self, name, start):
+        if start is not None:
+            self.record(name, start, time.perf_counter(), self.depth)
             
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if play_button.is_clicked(mouse_pos, event):
-                    game_state = PLAYING
-                    # Reset game
-                    player.health = player.max_health
-                    level_system = LevelSystem()
-                    money_system = MoneySystem()
-                    for enemy in enemies:
-                        enemy.kill()
-                    for attack in attacks:
-                        attack.kill()
-                    player.rect.x = 50
-                    player.rect.y = GROUND_HEIGHT - 100
-                elif options_button.is_clicked(mouse_pos, event):
-                    game_state = OPTIONS
-                elif how_to_play_button.is_clicked(mouse_pos, event):
-                    game_state = HOW_TO_PLAY
-                elif shop_button.is_clicked(mouse_pos, event):
-                    game_state = SHOP
-                elif quit_button.is_clicked(mouse_pos, event):
-                    running = False
-        
-        # Shop state
-        elif game_state == SHOP:
-            exit_btn = shop_system.draw(screen, money_system)
-            exit_btn.check_hover(mouse_pos)
+    def record(self, name, start, end, depth):
+        self.current[name] = self.current.get(name, 0.0) + (end - start)
+        if name not in self.section_depths:
+            self.section_depths[name] = depth
+        self.events.append((name, start, end, depth))
+        
+    # Values sampled with each frame, e.g. the load governor's tier
+    def set_counter(self, name, value):
+        self.counters[name] = value
+        
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+            self.current = {}
             
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                # Check weapon buy/sell buttons
-                for i, weapon in enumerate(shop_system.weapons):
-                    buy_btn_rect = pygame.Rect(SCREEN_WIDTH//2 + 100, 180 + i * 120 + 20, 80, 30)
-                    sell_btn_rect = pygame.Rect(SCREEN_WIDTH//2 + 100, 180 + i * 120 + 60, 80, 30)
-                    
-                    if buy_btn_rect.collidepoint(mouse_pos):
-                        shop_system.buy_weapon(i, player, money_system)
-                    elif sell_btn_rect.collidepoint(mouse_pos):
-                        shop_system.sell_weapon(i, money_system)
-                
-                if exit_btn.is_clicked(mouse_pos, event):
-                    game_state = MENU
-        
-        # Playing state
-        elif game_state == PLAYING:
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    player.jump()
-                elif event.key == pygame.K_ESCAPE:
-                    game_state = PAUSED
-                elif event.key == pygame.K_h:
-                    for enemy in enemies:
-                        if not enemy.is_dead and abs(player.rect.x - enemy.rect.x) < ATTACK_RANGE:
-                            if ally_system.try_convert_enemy(enemy):
-                                break
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        end = time.perf_counter()
+        self.frame_number += 1
+        self.frames.append((self.frame_number, end - self.frame_start, self.current, dict(self.counters)))
+        self.events.append(("frame", self.frame_start, end, -1))
+        self.frame_start = None
+        
+    def top_level_sections(self):
+        return [name for name, depth in self.section_depths.items() if depth == 0]
+        
+    def draw_overlay(self, surface, pos=(10, 110), size=(300, 140)):
+        # Rolling stacked graph of top-level sections, one column per frame.
+        # The white line marks the 60 FPS budget.
+        if not self.show_overlay:
+            return []
+        width, height = size
+        if self.overlay is None or self.overlay.get_size() != size:
+            self.overlay = pygame.Surface(size, pygame.SRCALPHA)
+        overlay = self.overlay
+        overlay.fill((0, 0, 0, 170))
+        
+        budget = 1.0 / FPS
+        scale = (height - 44) / (2 * budget)
+        names = self.top_level_sections()
+        colors = {name: self.COLORS[i % len(self.COLORS)] for i, name in enumerate(names)}
+        frames = list(self.frames)[-width:]
+        for column, (_, _, sections, _) in enumerate(frames):
+            bottom = height
+            for name in names:
+                bar = int(sections.get(name, 0.0) * scale)
+                if bar > 0:
+                    overlay.fill(colors[name], (column, bottom - bar, 1, bar))
+                    bottom -= bar
+        budget_y = height - int(budget * scale)
+        overlay.fill(WHITE, (0, budget_y, width, 1))
+        
+        # Legend with each section's average (ms) over the graphed frames
+        count = max(1, len(frames))
+        total = sum(frame[1] for frame in frames) / count
+        labels = [text_cache.render(small_font, "frame %.2f" % (total * 1000), WHITE)]
+        for name in names:
+            average = sum(sections.get(name, 0.0) for _, _, sections, _ in frames) / count
+            labels.append(text_cache.render(small_font, "%s %.2f" % (name, average * 1000), colors[name]))
+        if frames:
+            for name, value in frames[-1][3].items():
+                labels.append(text_cache.render(small_font, "%s %s" % (name, value), WHITE))
+        x, y = 4, 2
+        for label in labels:
+            if x + label.get_width() > width:
+                x, y = 4, y + 13
+            overlay.blit(label, (x, y))
+            x += label.get_width() + 6
+        return [surface.blit(overlay, pos)]
+        
+    def export_csv(self, path=PROFILER_CSV_PATH):
+        names = list(self.section_depths)
+        counter_names = sorted({name for frame in self.frames for name in frame[3]})
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "total_ms"] + names + counter_names)
+            for number, total, sections, counters in self.frames:
+                writer.writerow([number, "%.4f" % (total * 1000)] +
+                                ["%.4f" % (sections.get(name, 0.0) * 1000) for name in names] +
+                                [counters.get(name, "") for name in counter_names])
+                                
+    def export_chrome_trace(self, path=PROFILER_TRACE_PATH):
+        # Complete ("X") events in microseconds, viewable in chrome://tracing or Perfetto
+        events = [{"name": name, "ph": "X", "pid": 1, "tid": 1,
+                   "ts": round((start - self.origin) * 1e6, 3),
+                   "dur": round((end - start) * 1e6, 3)}
+                  for name, start, end, depth in self.events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
             
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:  # Left click for melee
-                    player.melee_attack()
-                elif event.button == 3:  # Right click for ranged
-                    player.ranged_attack()
-        
-        # Paused state
-        elif game_state == PAUSED:
-            resume_button.check_hover(mouse_pos)
-            menu_button.check_hover(mouse_pos)
+    def export(self):
+        try:
+            self.export_csv()
+            self.export_chrome_trace()
+            print(f"Profile written to {PROFILER_CSV_PATH} and {PROFILER_TRACE_PATH}")
+        except Exception as e:
+            print(f"Error writing profile: {e}")
+
+profiler = FrameProfiler()
+
+# Load tiers, mildest first. Each tier keeps the degradations of those before it.
+LOAD_TIER_DEFAULTS = {
+    "health_bars": True,  # Draw enemy health bars
+    "far_animation_step": 1,  # Distant entities animate every N ticks
+    "spawn_interval_scale": 1.0,
+    "max_enemies_scale": 1.0,
+    "ai_interval_scale": 1  # Multiplies the AI scheduler's think intervals
+}
+LOAD_TIERS = [
+    ("full quality", {}),
+    ("no enemy health bars", {"health_bars": False}),
+    ("slow distant animation", {"far_animation_step": 3}),
+    ("slower spawns", {"spawn_interval_scale": 2.0}),
+    ("fewer enemies", {"max_enemies_scale": 0.5}),
+    ("coarse AI", {"ai_interval_scale": 3})
+]
+
+def load_tier_settings():
+    settings = []
+    current = dict(LOAD_TIER_DEFAULTS)
+    for name, changes in LOAD_TIERS:
+        current = dict(current, **changes)
+        settings.append(current)
+    return settings
+
+LOAD_TIER_SETTINGS = load_tier_settings()
+
+# Watches the rolling average of frame work time (excluding the frame-rate
+# sleep). Above the budget it steps up one load tier; below restore_ratio of
+# the budget it steps back down. After each change the samples restart and it
+# holds for hold_frames, longer on the way down, so it does not flap.
+class LoadGovernor:
+    def __init__(self, budget=1.0 / FPS, window=30, restore_ratio=0.6, hold_frames=60):
+        self.budget = budget
+        self.restore_ratio = restore_ratio
+        self.hold_frames = hold_frames
+        self.samples = deque(maxlen=window)
+        self.tier = 0
+        self.hold = 0
+        
+    def record(self, frame_seconds):
+        self.samples.append(frame_seconds)
+        if self.hold > 0:
+            self.hold -= 1
+            return self.tier
+        if len(self.samples) < self.samples.maxlen:
+            return self.tier
+        average = self.average()
+        if average > self.budget and self.tier < len(LOAD_TIERS) - 1:
+            self.set_tier(self.tier + 1, self.hold_frames)
+        elif average < self.budget * self.restore_ratio and self.tier > 0:
+            self.set_tier(self.tier - 1, self.hold_frames * 2)
+        return self.tier
+        
+    def set_tier(self, tier, hold=0):
+        self.tier = tier
+        self.hold = hold
+        self.samples.clear()
+        
+    def average(self):
+        return sum(self.samples) / len(self.samples) if self.samples else 0.0
+        
+    def reset(self):
+        # Each run starts at full quality rather than the last run's tier
+        self.samples.clear()
+        self.tier = 0
+        self.hold = 0
+
+# Player inputs for one simulation tick. The load tier rides along so
+# recordings replay with the same degradations.
+class InputState:
+    def __init__(self, move=0, jump=False, melee=False, ranged=False, convert=False, load_tier=0):
+        self.move = move
+        self.jump = jump
+        self.melee = melee
+        self.ranged = ranged
+        self.convert = convert
+        self.load_tier = load_tier
+        
+    def held(self):
+        # One-shot actions fire once; movement and the load tier are held across ticks
+        return InputState(self.move, load_tier=self.load_tier)
+        
+    @classmethod
+    def from_keys(cls, keys):
+        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+            return cls(1)
+        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
+            return cls(-1)
+        return cls(0)
+        
+    # Bitmask used by input recordings
+    def to_bits(self):
+        bits = 0
+        if self.move < 0:
+            bits |= 1
+        elif self.move > 0:
+            bits |= 2
+        if self.jump:
+            bits |= 4
+        if self.melee:
+            bits |= 8
+        if self.ranged:
+            bits |= 16
+        if self.convert:
+            bits |= 32
+        return bits | (self.load_tier << 6)
+        
+    @classmethod
+    def from_bits(cls, bits):
+        move = -1 if bits & 1 else (1 if bits & 2 else 0)
+        return cls(move, bool(bits & 4), bool(bits & 8), bool(bits & 16), bool(bits & 32), bits >> 6)
+
+# The part of the world on screen. It centres on its target without leaving
+# the world, and keeps its previous position for render interpolation.
+class Camera:
+    def __init__(self, world_width, width=SCREEN_WIDTH):
+        self.world_width = world_width
+        self.width = width
+        self.x = 0
+        self.previous_x = 0
+        
+    def follow(self, target_x, snap=False):
+        self.previous_x = self.x
+        self.x = max(0, min(self.world_width - self.width, target_x - self.width // 2))
+        if snap:
+            self.previous_x = self.x
             
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if resume_button.is_clicked(mouse_pos, event):
-                    game_state = PLAYING
-                elif menu_button.is_clicked(mouse_pos, event):
-                    game_state = MENU
-        
-        # Options state
-        elif game_state == OPTIONS:
-            back_button.check_hover(mouse_pos)
+    def view_x(self, alpha=1.0):
+        if alpha >= 1.0:
+            return self.x
+        return round(self.previous_x + (self.x - self.previous_x) * alpha)
+
+# The level, split into chunks of chunk_width along x. Chunks the camera sees,
+# plus margin on each side, are active and simulated as usual. Enemies and
+# allies in any other chunk are dormant: parked in that chunk, outside every
+# sprite group, index and AI queue, so they cost nothing per tick however long
+# the level is. They wake where they were left when their chunk is active again.
+class World:
+    def __init__(self, game, width=WORLD_WIDTH, chunk_width=CHUNK_WIDTH, margin=ACTIVE_CHUNK_MARGIN):
+        self.game = game
+        self.width = width
+        self.chunk_width = chunk_width
+        self.margin = margin
+        self.chunk_count = max(1, -(-width // chunk_width))
+        self.parked = 0
+        self.woken = 0
+        self.clear()
+        
+    def clear(self):
+        # Per chunk: parked sprites as (kind, sprite), parked horde enemies as row blocks
+        self.sprites = [[] for _ in range(self.chunk_count)]
+        self.horde_rows = [[] for _ in range(self.chunk_count)]
+        self.dormant = 0
+        self.dormant_enemies = 0
+        self.active = None
+        
+    def chunk_of(self, x):
+        return min(self.chunk_count - 1, max(0, int(x) // self.chunk_width))
+        
+    def active_span(self, camera):
+        first = self.chunk_of(camera.x) - self.margin
+        last = self.chunk_of(camera.x + camera.width - 1) + self.margin
+        return max(0, first), min(self.chunk_count - 1, last)
+        
+    def update(self, camera, force=False):
+        # Entities only cross into dormant chunks when the active span moves
+        # (they head for the player), so nothing is checked otherwise
+        span = self.active_span(camera)
+        if span == self.active and not force:
+            return
+        previous = self.active
+        self.active = span
+        self.park_outside()
+        self.wake(previous)
+        
+    def park_outside(self):
+        game = self.game
+        first, last = self.active
+        for kind, group in (("enemy", game.enemies), ("ally", game.ally_system.allies)):
+            parked = set()
+            for sprite in group.sprites():
+                chunk = self.chunk_of(sprite.rect.x)
+                if first <= chunk <= last:
+                    continue
+                # Dying enemies are finished off rather than kept
+                if getattr(sprite, "is_dead", False):
+                    sprite.kill()
+                    continue
+                if kind == "enemy":
+                    game.enemy_index.remove(sprite)
+                game.previous_positions.pop(sprite, None)
+                pygame.sprite.Sprite.kill(sprite)
+                self.sprites[chunk].append((kind, sprite))
+                parked.add(sprite)
+            if parked:
+                game.ai.suspend(kind, parked)
+                self.dormant += len(parked)
+                self.parked += len(parked)
+                if kind == "enemy":
+                    self.dormant_enemies += len(parked)
+        
+        horde = game.horde
+        if horde is not None and horde.count:
+            chunks = np.clip(horde.x[:horde.count] // self.chunk_width, 0, self.chunk_count - 1)
+            outside = (chunks < first) | (chunks > last)
+            if outside.any():
+                rows = horde.park(outside)
+                living = rows["state"] != Horde.DYING
+                rows = {name: values[living] for name, values in rows.items()}
+                chunks = chunks[outside][living]
+                for chunk in np.unique(chunks).tolist():
+                    in_chunk = chunks == chunk
+                    self.horde_rows[chunk].append({name: values[in_chunk] for name, values in rows.items()})
+                self.dormant += len(chunks)
+                self.dormant_enemies += len(chunks)
+                self.parked += len(chunks)
+                
+    def wake(self, previous):
+        game = self.game
+        first, last = self.active
+        for chunk in range(first, last + 1):
+            if previous is not None and previous[0] <= chunk <= previous[1]:
+                continue
+            for kind, sprite in self.sprites[chunk]:
+                if kind == "enemy":
+                    game.enemies.add(sprite)
+                    game.enemy_index.insert(sprite)
+                    self.dormant_enemies -= 1
+                else:
+                    game.ally_system.allies.add(sprite)
+                game.all_sprites.add(sprite)
+                game.ai.resume(kind, sprite)
+            woken = len(self.sprites[chunk])
+            if self.horde_rows[chunk]:
+                rows = sum(len(rows["ids"]) for rows in self.horde_rows[chunk])
+                woken += rows
+                self.dormant_enemies -= rows
+                game.horde.unpark(self.horde_rows[chunk])
+            self.sprites[chunk] = []
+            self.horde_rows[chunk] = []
+            self.dormant -= woken
+            self.woken += woken
             
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if back_button.is_clicked(mouse_pos, event):
-                    game_state = MENU
-        
-        # How to Play state
-        elif game_state == HOW_TO_PLAY:
-            back_button.check_hover(mouse_pos)
+    def reset(self):
+        # Parked sprites go back to their pools
+        game = self.game
+        for parked in self.sprites:
+            for kind, sprite in parked:
+                (game.enemy_pool if kind == "enemy" else game.ally_pool).release(sprite)
+        self.clear()
+        
+    def stats(self):
+        return {
+            "chunks": self.chunk_count,
+            "active": list(self.active) if self.active else None,
+            "dormant": self.dormant,
+            "dormant_enemies": self.dormant_enemies,
+            "parked": self.parked,
+            "woken": self.woken
+        }
+
+# Gameplay state and rules, independent of the window and the main loop
+class Game:
+    def __init__(self, seed=None, interpolate=False, spatial_index=SPATIAL_INDEX, horde=USE_HORDE, world_width=WORLD_WIDTH):
+        self.rng = random.Random(seed)
+        self.ticks = 0
+        self.game_over = False
+        
+        # Sprite positions at the start of the last tick, for render interpolation
+        self.interpolate = interpolate
+        self.previous_positions = {}
+        
+        # Degradations of the current load tier, set from each tick's inputs
+        self.load_tier = 0
+        self.quality = LOAD_TIER_SETTINGS[0]
+        self.ai = AIScheduler(self)
+        
+        # Create sprite groups
+        self.all_sprites = pygame.sprite.Group()
+        self.ground_group = pygame.sprite.Group()
+        self.enemies = pygame.sprite.Group()
+        self.projectiles = ProjectileSystem()
+        self.enemy_index = make_spatial_index(spatial_index)
+        
+        # Dead enemies and removed allies are reused for later spawns
+        self.enemy_pool = ObjectPool(lambda: Enemy(self), 0 if horde else ENEMY_POOL_PREWARM)
+        self.ally_pool = ObjectPool(lambda: Ally(self), ALLY_POOL_PREWARM)
+        
+        # In horde mode enemies live in arrays and the horde answers index queries
+        self.horde = Horde(self) if horde else None
+        if self.horde is not None:
+            self.enemy_index = self.horde
+        
+        # Scrolling world; the ground strip moves with the camera
+        self.world = World(self, world_width)
+        self.camera = Camera(world_width)
+        self.ground = Ground()
+        self.ground_group.add(self.ground)
+        self.all_sprites.add(self.ground)
+        
+        # Create player
+        self.player = EnhancedPlayer(self, 50, GROUND_HEIGHT - 100)
+        self.all_sprites.add(self.player)
+        
+        # Initialize game systems
+        self.money_system = MoneySystem()
+        self.level_system = LevelSystem()
+        self.enemy_spawner = EnemySpawner(self, max_enemies=4)
+        self.ally_system = AllySystem(self)
+        self.shop_system = EnhancedShopSystem()
+        self.follow_player(snap=True)
+        
+    def reset(self):
+        # A fresh player that keeps its weapons and attack power
+        old_player = self.player
+        old_player.kill()
+        self.player = EnhancedPlayer(self, 50, GROUND_HEIGHT - 100)
+        self.player.weapons = old_player.weapons
+        self.player.current_weapon = old_player.current_weapon
+        self.player.attack_power = old_player.attack_power
+        self.all_sprites.add(self.player)
+        
+        self.level_system = LevelSystem()
+        self.money_system = MoneySystem()
+        for enemy in self.enemies:
+            enemy.kill()
+        if self.horde is not None:
+            self.horde.clear()
+        for ally in self.ally_system.allies:
+            ally.kill()
+        self.projectiles.clear()
+        self.ai.clear()
+        self.world.reset()
+        self.follow_player(snap=True)
+        self.enemy_spawner.spawn_timer = 0
+        self.ally_system.convert_timer = 0
+        self.ticks = 0
+        self.previous_positions = {}
+        self.game_over = False
+        
+    def resize_world(self, width):
+        # Only on an empty world, e.g. straight after reset()
+        if width != self.world.width:
+            self.world = World(self, width)
+            self.camera = Camera(width)
+            self.follow_player(snap=True)
             
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if back_button.is_clicked(mouse_pos, event):
-                    game_state = MENU
+    def follow_player(self, snap=False):
+        # Keep the camera on the player and the chunks around it active
+        self.camera.follow(self.player.rect.centerx, snap)
+        self.ground.rect.x = self.camera.x
+        self.world.update(self.camera)
+        
+    def add_enemy(self, x, y):
+        if self.horde is not None:
+            return self.horde.spawn(x, y)
+        enemy = self.enemy_pool.acquire(x, y)
+        self.all_sprites.add(enemy)
+        self.enemies.add(enemy)
+        self.enemy_index.insert(enemy)
+        return enemy
+        
+    def pool_stats(self):
+        return {"enemies": self.enemy_pool.stats(), "allies": self.ally_pool.stats()}
+        
+    def enemy_count(self):
+        if self.horde is not None:
+            return len(self.horde)
+        return len(self.enemies)
+        
+    def convert_nearby_enemy(self):
+        x = self.player.rect.x
+        for enemy in self.enemy_index.in_x_range(x - ATTACK_RANGE, x + ATTACK_RANGE):
+            if not enemy.is_dead:
+                if self.ally_system.try_convert_enemy(enemy):
+                    return True
+        return False
         
-        # Game Over state
-        elif game_state == GAME_OVER:
-            menu_button.check_hover(mouse_pos)
-            quit_button.check_hover(mouse_pos)
+    def apply_inputs(self, inputs):
+        if inputs.load_tier != self.load_tier:
+            self.load_tier = inputs.load_tier
+            self.quality = LOAD_TIER_SETTINGS[self.load_tier]
+        self.player.move_direction = inputs.move
+        if inputs.jump:
+            self.player.jump()
+        if inputs.convert:
+            self.convert_nearby_enemy()
+        if inputs.melee:
+            self.player.melee_attack()
+        if inputs.ranged:
+            self.player.ranged_attack()
             
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if menu_button.is_clicked(mouse_pos, event):
-                    game_state = MENU
-                elif quit_button.is_clicked(mouse_pos, event):
-                    running = False
-    
-    # Update game state
-    if game_state == PLAYING:
-        # Update all game objects
-        all_sprites.update()
-        enemy_spawner.update()
-        ally_system.update()
+    def tick(self, inputs=None):
+        audio.begin_tick()
+        if self.interpolate:
+            self.previous_positions = {sprite: sprite.rect.topleft for sprite in self.all_sprites}
+        self.apply_inputs(inputs or InputState())
+        
+        # Update all game objects: player, enemies, allies, then projectiles
+        with profiler.section("player"):
+            self.player.update()
+        with profiler.section("world"):
+            self.follow_player()
+        profiler.set_counter("dormant", self.world.dormant)
+        # Agents due to think decide first, then everyone acts
+        self.ai.begin_tick()
+        with profiler.section("enemies"):
+            if self.horde is not None:
+                self.ai.run_horde(self.horde)
+                self.horde.update(self.player)
+            else:
+                self.ai.run("enemy")
+                self.enemies.update()
+        with profiler.section("allies"):
+            self.ai.run("ally")
+            self.ally_system.allies.update()
+        self.ai.end_tick()
+        with profiler.section("projectiles"):
+            self.projectiles.update(self.camera.x, self.camera.x + self.camera.width)
+        with profiler.section("spawner"):
+            self.enemy_spawner.update()
+            self.ally_system.update()
         
         # Check for collisions
-        hits = pygame.sprite.groupcollide(attacks, enemies, True, False)
-        for attack, enemies_hit in hits.items():
-            for enemy in enemies_hit:
-                if not enemy.is_dead and enemy.take_damage(attack.damage):
-                    if level_system.add_xp(10):
-                        money_system.level_up()
+        with profiler.section("collisions"):
+            for i, rect, damage in self.projectiles.player_shots():
+                enemies_hit = self.enemy_index.colliding(rect)
+                if not enemies_hit:
+                    continue
+                self.projectiles.discard(i)
+                for enemy in enemies_hit:
+                    if not enemy.is_dead and enemy.take_damage(damage):
+                        levels = self.level_system.add_xp(KILL_XP)
+                        if levels:
+                            self.money_system.level_up(levels)
+            self.player.health -= self.projectiles.hit(self.player.rect, from_player=False)
+            self.projectiles.flush()
+        
+        self.ticks += 1
         
         # Check player health
-        if player.health <= 0:
-            game_state = GAME_OVER
+        if self.player.health <= 0:
+            self.game_over = True
+            
+    def step(self, inputs=None, n_ticks=1):
+        # Run up to n_ticks simulation ticks, stopping early on game over
+        ticks_run = 0
+        while ticks_run < n_ticks and not self.game_over:
+            self.tick(inputs)
+            ticks_run += 1
+            if inputs is not None:
+                inputs = inputs.held()
+        return ticks_run
+        
+    def animation_step(self, x):
+        # Ticks between animation updates for an entity at x
+        step = self.quality["far_animation_step"]
+        if step > 1 and abs(x - self.player.rect.x) > FAR_ANIMATION_DISTANCE:
+            return step
+        return 1
+        
+    def render_position(self, sprite, alpha=1.0):
+        x, y = sprite.rect.topleft
+        previous = self.previous_positions.get(sprite)
+        if previous is None or alpha >= 1.0:
+            return x, y
+        return (round(previous[0] + (x - previous[0]) * alpha),
+                round(previous[1] + (y - previous[1]) * alpha))
+        
+    def screen_position(self, sprite, alpha=1.0, view_x=0):
+        # Where the sprite is drawn, or None when it is outside the view
+        x, y = self.render_position(sprite, alpha)
+        if x >= view_x + self.camera.width or x + sprite.rect.width <= view_x:
+            return None
+        return x - view_x, y
+        
+    def sprite_blits(self, alpha=1.0):
+        # Only what the camera sees is drawn
+        view_x = self.camera.view_x(alpha)
+        blits = []
+        for sprite in self.all_sprites:
+            pos = self.screen_position(sprite, alpha, view_x)
+            if pos is not None:
+                blits.append((sprite.image, pos))
+        if self.horde is not None:
+            blits.extend(self.horde.blits(alpha, view_x, self.camera.width))
+        blits.extend(self.projectiles.blits(alpha, view_x, self.camera.width))
+        return blits
+        
+    def draw_hud(self, surface, alpha=1.0):
+        view_x = self.camera.view_x(alpha)
+        with profiler.section("health_bars"):
+            rects = [self.player.draw_health(surface, self.screen_position(self.player, alpha, view_x))]
+        with profiler.section("level"):
+            rects.extend(self.level_system.draw(surface))
+        with profiler.section("money"):
+            rects.extend(self.money_system.draw(surface))
+        
+        # Enemy health bars, unless the load governor has turned them off
+        if not self.quality["health_bars"]:
+            return rects
+        with profiler.section("health_bars"):
+            for enemy in self.enemies:
+                pos = self.screen_position(enemy, alpha, view_x)
+                if pos is not None:
+                    rects.append(enemy.draw_health(surface, pos))
+            if self.horde is not None:
+                rects.extend(self.horde.draw_health(surface, alpha, view_x, self.camera.width))
+        return rects
+        
+    def draw(self, surface, alpha=1.0):
+        draw_world_background(surface, self.camera.view_x(alpha))
+        surface.blits(self.sprite_blits(alpha), False)
+
+# Per-tick inputs recorded as run-length encoded bitmasks, plus the RNG seed
+# and starting state, so a session can be replayed exactly.
+# File layout: magic, version, seed, tick count, start state (JSON), then
+# runs of (varint input bits, varint repeat count). Version 1 stored the
+# input bits as a single byte.
+RECORDING_MAGIC = b"BGIN"
+RECORDING_VERSION = 2
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+class InputRecording:
+    def __init__(self, seed, start_state=None):
+        self.seed = seed
+        self.start_state = start_state or {}
+        self.runs = []
+        self.ticks = 0
+        
+    def __len__(self):
+        return self.ticks
+        
+    @classmethod
+    def start(cls, game):
+        # Reseed the game so the recording holds everything a replay needs
+        seed = random.getrandbits(63)
+        game.rng.seed(seed)
+        return cls(seed, SaveSystem.snapshot(game))
+        
+    def record(self, inputs):
+        bits = inputs.to_bits()
+        if self.runs and self.runs[-1][0] == bits:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([bits, 1])
+        self.ticks += 1
+        
+    def inputs(self):
+        for bits, count in self.runs:
+            for _ in range(count):
+                yield InputState.from_bits(bits)
+                
+    def new_game(self, **options):
+        # Recordings from before the scrolling world were made on one screen
+        options.setdefault("world_width", self.start_state.get("world_width", SCREEN_WIDTH))
+        game = Game(seed=self.seed, **options)
+        if self.start_state:
+            SaveSystem().restore(game, self.start_state)
+        game.rng.seed(self.seed)
+        return game
+        
+    def to_bytes(self):
+        state = json.dumps(self.start_state, separators=(',', ':')).encode()
+        out = bytearray(RECORDING_MAGIC)
+        out += struct.pack("<BQII", RECORDING_VERSION, self.seed, self.ticks, len(state))
+        out += state
+        for bits, count in self.runs:
+            write_varint(out, bits)
+            write_varint(out, count)
+        return bytes(out)
+        
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(RECORDING_MAGIC)] != RECORDING_MAGIC:
+            raise ValueError("Not an input recording")
+        offset = len(RECORDING_MAGIC)
+        version, seed, ticks, state_length = struct.unpack_from("<BQII", data, offset)
+        if version not in (1, RECORDING_VERSION):
+            raise ValueError(f"Unsupported recording version {version}")
+        offset += struct.calcsize("<BQII")
+        recording = cls(seed, json.loads(data[offset:offset + state_length]))
+        offset += state_length
+        while offset < len(data):
+            if version == 1:
+                bits = data[offset]
+                offset += 1
+            else:
+                bits, offset = read_varint(data, offset)
+            count, offset = read_varint(data, offset)
+            recording.runs.append([bits, count])
+        recording.ticks = ticks
+        return recording
+        
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+            
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+def save_recording(recording, path):
+    try:
+        recording.save(path)
+        print(f"Recorded {len(recording)} ticks to {path}")
+    except Exception as e:
+        print(f"Error saving recording: {e}")
+
+# Replay a recording as fast as possible without a window
+def replay_headless(path):
+    init_pygame(headless=True)
+    asset_pack.open()
+    load_backgrounds()
+    frame_cache.prewarm(PLAYER_ANIMATIONS + ENEMY_ANIMATIONS)
+    recording = InputRecording.load(path)
+    game = recording.new_game()
+    
+    start = time.perf_counter()
+    for inputs in recording.inputs():
+        if not game.step(inputs):
+            break
+    elapsed = time.perf_counter() - start
+    
+    print(f"Replayed {game.ticks} of {len(recording)} ticks in {elapsed:.3f}s "
+          f"({game.ticks / max(elapsed, 1e-9):.0f} ticks/s)")
+    print(f"Level {game.level_system.level}, kills {game.level_system.total_kills}, "
+          f"money ${game.money_system.money}, health {game.player.health}, game over: {game.game_over}")
+    return game
+
+# Full-screen redraw for every state
+def draw_full_frame(game_state, game, alpha=1.0, can_continue=False):
+    menu_screen = menu_screens.get(game_state)
+    if menu_screen is not None:
+        if game_state == MENU:
+            menu_screen.set_visible(continue_button, can_continue)
+        menu_screen.draw(screen, game, full=True)
+        return
     
-    # Drawing
     screen.fill(BLACK)
     
-    if game_state == MENU:
-        draw_menu()
-    elif game_state == PLAYING:
-        # Draw background
-        screen.blit(background, (0, 0))
-        
-        # Draw all sprites
-        all_sprites.draw(screen)
+    if game_state == PLAYING:
+        # Draw background and all sprites
+        game.draw(screen, alpha)
         
         # Draw HUD
-        player.draw_health(screen)
-        level_system.draw(screen)
-        money_system.draw(screen)
-        
-        # Draw enemy health bars
-        for enemy in enemies:
-            enemy.draw_health(screen)
-    
-    elif game_state == PAUSED:
-        # Draw game behind pause menu
-        screen.blit(background, (0, 0))
-        all_sprites.draw(screen)
-        draw_pause_menu()
-    
-    elif game_state == OPTIONS:
-        draw_options_menu()
-    
-    elif game_state == HOW_TO_PLAY:
-        draw_how_to_play()
+        game.draw_hud(screen, alpha)
     
     elif game_state == SHOP:
         # Draw game behind shop
-        screen.blit(background, (0, 0))
-        all_sprites.draw(screen)
-        shop_system.draw(screen, money_system)
+        game.draw(screen)
+        game.shop_system.draw(screen, game.money_system)
+
+# Wait for background loading, then load sprite animations up front so
+# spawns never touch the disk
+def finish_loading():
+    asset_loader.wait()
+    frame_cache.prewarm(PLAYER_ANIMATIONS + ENEMY_ANIMATIONS)
+
+def main(record_path=None, replay_path=None):
+    global menu_bg_x
+    init_pygame()
+    clock = pygame.time.Clock()
+    
+    # Use the asset pack when it is up to date. Otherwise rebuild it for the
+    # next launch and start decoding everything in the background. Only the
+    # background image is waited for; gameplay assets keep streaming in
+    # behind the menu.
+    if not asset_pack.open():
+        asset_loader.submit(build_asset_pack)
+        asset_loader.request(BACKGROUND_IMAGE)
+        for folder_path, scale in PLAYER_ANIMATIONS + ENEMY_ANIMATIONS:
+            asset_loader.request_folder(folder_path)
+        for path, scale in GAMEPLAY_IMAGES:
+            asset_loader.request(path)
+    while not asset_loader.is_ready(BACKGROUND_IMAGE):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                asset_loader.shutdown()
+                pygame.quit()
+                sys.exit()
+        draw_loading_screen(asset_loader.progress())
+        pygame.display.flip()
+        clock.tick(FPS)
+    load_backgrounds()
+    
+    timestep = FixedTimestep()
+    governor = LoadGovernor()
+    game = None  # Built once gameplay assets are in, or on first use
+    save_system = SaveSystem()
+    dirty_renderer = DirtyRenderer()
+    game_state = MENU
+    shown_state = None  # State of the last drawn frame, to notice screen changes
     
-    elif game_state == GAME_OVER:
-        draw_game_over()
+    # Input recording and replay
+    recording = None
+    replay = None
+    if replay_path:
+        replay_recording = InputRecording.load(replay_path)
+        finish_loading()
+        game = replay_recording.new_game(interpolate=True)
+        replay = replay_recording.inputs()
+        game_state = PLAYING
+    menu_music_playing = False
+    game_music_playing = False
     
-    # Save game periodically
-    if game_state == PLAYING and pygame.time.get_ticks() % 10000 == 0:  # Every 30 seconds
-        save_system.save_game(player, money_system, level_system)
+    # Main game loop
+    inputs = InputState()
+    running = True
+    while running:
+        frame_start = time.perf_counter()
+        profiler.begin_frame()
+        audio.begin_tick()
+        mouse_pos = pygame.mouse.get_pos()
+        
+        # Finish streamed-in assets a few at a time, then build the game
+        if game is None:
+            asset_loader.poll()
+            if not asset_loader.pending():
+                finish_loading()
+                game = Game(interpolate=True)
+        
+        # Update menu background position
+        if game_state == MENU:
+            menu_bg_x -= menu_scroll_speed
+            if menu_bg_x <= -menu_bg_width:
+                menu_bg_x = 0
+        
+        # Handle music based on game state
+        if game_state == MENU and not menu_music_playing:
+            try:
+                mixer.music.stop()
+                mixer.music.load("assets/sounds/menu/button/click.mp3")
+                mixer.music.play(-1)
+                menu_music_playing = True
+                game_music_playing = False
+            except:
+                menu_music_playing = False
+
+        elif game_state == PLAYING and not game_music_playing:
+            try:
+                mixer.music.stop()
+                mixer.music.load("assets/sounds/game_music.mp3")
+                mixer.music.play(-1)
+                game_music_playing = True
+                menu_music_playing = False
+            except:
+                game_music_playing = False
+        
+        # Event handling
+        events_start = profiler.mark()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                dirty_renderer.invalidate()
+                shown_state = None
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle()
+                shown_state = None
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                profiler.export()
+            
+            # Menu screens update hover on mouse motion and report clicked buttons
+            menu_screen = menu_screens.get(game_state)
+            clicked = menu_screen.handle_event(event) if menu_screen is not None else None
+            
+            # Menu state
+            if game_state == MENU:
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and game is None:
+                    # Clicked before loading finished: finish it now
+                    finish_loading()
+                    game = Game(interpolate=True)
+                
+                if clicked is continue_button:
+                    data = save_system.load_game()
+                    if data:
+                        save_system.restore(game, data)
+                        governor.reset()
+                        game_state = PLAYING
+                        if record_path:
+                            recording = InputRecording.start(game)
+                elif clicked is play_button:
+                    game_state = PLAYING
+                    game.reset()
+                    governor.reset()
+                    if record_path:
+                        recording = InputRecording.start(game)
+                elif clicked is options_button:
+                    game_state = OPTIONS
+                elif clicked is how_to_play_button:
+                    game_state = HOW_TO_PLAY
+                elif clicked is shop_button:
+                    game_state = SHOP
+                elif clicked is quit_button:
+                    running = False
+            
+            # Shop state
+            elif game_state == SHOP:
+                shop_system = game.shop_system
+                shop_view = shop_system.get_view()
+                if event.type == pygame.MOUSEMOTION:
+                    shop_view.check_hover(event.pos)
+                
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    # Check weapon buy/sell buttons
+                    action, index = shop_view.hit_test(mouse_pos)
+                    if action == "buy":
+                        shop_system.buy_weapon(index, game.player, game.money_system)
+                    elif action == "sell":
+                        shop_system.sell_weapon(index, game.money_system)
+                    elif shop_view.exit_button.is_clicked(mouse_pos, event):
+                        game_state = MENU
+            
+            # Playing state
+            elif game_state == PLAYING:
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        inputs.jump = True
+                    elif event.key == pygame.K_ESCAPE:
+                        game_state = PAUSED
+                    elif event.key == pygame.K_h:
+                        inputs.convert = True
+                
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if event.button == 1:  # Left click for melee
+                        inputs.melee = True
+                    elif event.button == 3:  # Right click for ranged
+                        inputs.ranged = True
+            
+            # Paused state
+            elif game_state == PAUSED:
+                if clicked is resume_button:
+                    game_state = PLAYING
+                elif clicked is menu_button:
+                    save_system.save_game(game)
+                    game_state = MENU
+            
+            # Options and How to Play states
+            elif game_state in (OPTIONS, HOW_TO_PLAY):
+                if clicked is back_button:
+                    game_state = MENU
+            
+            # Game Over state
+            elif game_state == GAME_OVER:
+                if clicked is menu_button:
+                    game_state = MENU
+                elif clicked is quit_button:
+                    running = False
+        
+        profiler.measure("events", events_start)
+        
+        # Update game state at the fixed tick rate. One-shot actions stay
+        # pending until a tick consumes them.
+        if game_state == PLAYING:
+            inputs.move = InputState.from_keys(pygame.key.get_pressed()).move
+            inputs.load_tier = governor.tier
+            with profiler.section("update"):
+                for _ in range(timestep.advance(time.perf_counter())):
+                    if replay is not None:
+                        # Replays ignore live input and feed the recorded ticks
+                        replay_inputs = next(replay, None)
+                        if replay_inputs is None:
+                            replay = None
+                            game_state = MENU
+                            break
+                        game.step(replay_inputs)
+                        continue
+                    if game.step(inputs) and recording is not None:
+                        recording.record(inputs)
+                    inputs = inputs.held()
+            
+            # Check player health
+            if game.game_over:
+                game_state = GAME_OVER
+        else:
+            timestep.reset()
+            inputs = InputState()
+        
+        # A recording ends when play does
+        if recording is not None and game_state in (MENU, GAME_OVER):
+            save_recording(recording, record_path)
+            recording = None
+        
+        # Save game periodically, except while watching a replay
+        if game_state == PLAYING and replay_path is None:
+            save_system.autosave(game, time.monotonic())
+        
+        # Drawing, interpolated between the last two ticks
+        alpha = timestep.alpha()
+        if game_state == PLAYING and USE_DIRTY_RECTS:
+            with profiler.section("sprite_list"):
+                blits = game.sprite_blits(alpha)
+            dirty_renderer.draw(screen, blits, lambda surface: game.draw_hud(surface, alpha) + profiler.draw_overlay(surface),
+                                game.camera.view_x(alpha))
+            shown_state = game_state
+        else:
+            # Any other screen repaints everything, so the next PLAYING frame must too
+            dirty_renderer.invalidate()
+            menu_screen = menu_screens.get(game_state)
+            if menu_screen is not None and game_state != shown_state:
+                menu_screen.enter(pygame.mouse.get_pos(), game)
+            with profiler.section("draw"):
+                if menu_screen is not None and not profiler.enabled:
+                    # Retained menus redraw only the buttons whose hover state changed
+                    if game_state == MENU:
+                        menu_screen.set_visible(continue_button, save_system.save_exists)
+                    updated_rects = menu_screen.draw(screen, game)
+                else:
+                    draw_full_frame(game_state, game, alpha, save_system.save_exists)
+                    profiler.draw_overlay(screen)
+                    updated_rects = None
+            with profiler.section("present"):
+                if updated_rects is None:
+                    pygame.display.flip()
+                elif updated_rects:
+                    pygame.display.update(updated_rects)
+            shown_state = game_state
+        # Only gameplay frames count towards the load governor
+        if game_state == PLAYING:
+            governor.record(time.perf_counter() - frame_start)
+        profiler.set_counter("tier", governor.tier)
+        profiler.end_frame()
+        
+        # Only gameplay renders above the tick rate; menus keep their per-frame animation speed
+        clock.tick(MAX_RENDER_FPS if game_state == PLAYING else FPS)
     
-    pygame.display.flip()
-    clock.tick(FPS)
+    if recording is not None:
+        save_recording(recording, record_path)
+    if game_state in (PLAYING, PAUSED) and replay_path is None:
+        save_system.save_game(game)
+    save_system.flush()
+    asset_loader.shutdown()
+    pygame.quit()
+    sys.exit()
 
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Black Gun")
+    parser.add_argument("--record", metavar="FILE", help="record gameplay inputs to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="replay a recording made with --record")
+    parser.add_argument("--headless", action="store_true", help="with --replay, run without a window at full speed")
+    parser.add_argument("--build-pack", action="store_true", help=f"bake all images into {ASSET_PACK_FILE} and exit")
+    args = parser.parse_args()
+    if args.build_pack:
+        print(f"Wrote {build_asset_pack()} images to {ASSET_PACK_FILE}")
+    elif args.replay and args.headless:
+        replay_headless(args.replay)
+    else:
+        main(record_path=args.record, replay_path=args.replay)